@@ -0,0 +1,196 @@
+"""
+Project 1: Data Structure Design and Implementation
+Dynamic Inventory Management System - Async.
+
+asyncio front-end for the inventory. Concurrent get_product calls made in the same event loop iteration are
+coalesced into one multi-get, filters and listings run in a thread pool so large scans never block the event
+loop, and a bounded number of scans may be waiting at once (backpressure). Writes run in order on their own thread.
+"""
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from DynamicInventoryManagement_Optimized import ConcurrentInventory
+
+# Async facade over an inventory, by default a ConcurrentInventory since scans and writes run on other threads.
+class AsyncInventory:
+    def __init__(self, inventory=None, scan_workers=2, max_pending_scans=8, max_batch=1024):
+        self.inventory = inventory if inventory is not None else ConcurrentInventory()
+        self.max_batch = max_batch
+        self.read_executor = ThreadPoolExecutor(scan_workers, thread_name_prefix='inventory-read')
+        # A single writer thread keeps writes in the order they were awaited.
+        self.write_executor = ThreadPoolExecutor(1, thread_name_prefix='inventory-write')
+        # Scans beyond this many running or queued wait here instead of piling up in the executor.
+        self.scan_slots = asyncio.Semaphore(max_pending_scans)
+        self.pending_gets = []
+        self.get_calls = 0
+        self.get_batches = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    # Shut the executors down from a worker thread, waiting for running operations would block the event loop.
+    async def aclose(self):
+        await asyncio.to_thread(self.close)
+
+    # Blocking shutdown, for callers outside the event loop.
+    def close(self):
+        self.read_executor.shutdown(wait=True)
+        self.write_executor.shutdown(wait=True)
+
+    # Look up one product. Lookups waiting in the same loop iteration are sent together as one get_products call.
+    async def get_product(self, product_id):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending_gets.append((product_id, future))
+        self.get_calls += 1
+        if len(self.pending_gets) == 1:
+            loop.call_soon(self._flush_gets, loop)
+        elif len(self.pending_gets) >= self.max_batch:
+            self._flush_gets(loop)
+        return await future
+
+    # Helper sending the waiting lookups as one multi-get and resolving their futures.
+    def _flush_gets(self, loop):
+        batch, self.pending_gets = self.pending_gets, []
+        if not batch:
+            return
+        self.get_batches += 1
+        lookup = loop.run_in_executor(self.read_executor, self.inventory.get_products,
+                                      [product_id for product_id, _ in batch])
+
+        def resolve(done):
+            if done.cancelled():
+                # The lookup was dropped (e.g. the pool shut down), its waiters are cancelled with it.
+                for _, future in batch:
+                    future.cancel()
+                return
+            error = done.exception()
+            for product_id, future in batch:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(done.result().get(product_id))
+
+        lookup.add_done_callback(resolve)
+
+    # Helper running a read in the thread pool once a scan slot is free.
+    async def _scan(self, method, *args, **kwargs):
+        async with self.scan_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.read_executor, partial(method, *args, **kwargs))
+
+    async def filter_products(self, **criteria):
+        return await self._scan(self.inventory.filter_products, **criteria)
+
+    async def filter_product_ids(self, **criteria):
+        return await self._scan(self.inventory.filter_product_ids, **criteria)
+
+    async def list_products(self, **paging):
+        return await self._scan(self.inventory.list_products, **paging)
+
+    async def top_k(self, key, k, **criteria):
+        return await self._scan(self.inventory.top_k, key, k, **criteria)
+
+    # Helper running a write on the writer thread.
+    async def _write(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.write_executor, partial(method, *args, **kwargs))
+
+    async def add_product(self, product_id, name, price, quantity, category, **attributes):
+        return await self._write(self.inventory.add_product, product_id, name, price, quantity, category, **attributes)
+
+    async def remove_product(self, product_id):
+        return await self._write(self.inventory.remove_product, product_id)
+
+    async def update_price(self, product_id, price):
+        return await self._write(self.inventory.update_price, product_id, price)
+
+    async def update_quantity(self, product_id, quantity):
+        return await self._write(self.inventory.update_quantity, product_id, quantity)
+
+    async def bulk_upsert(self, data):
+        return await self._write(self.inventory.bulk_upsert, data)
+
+    async def warm_up(self):
+        return await self._write(self.inventory.warm_up)
+
+    # Average number of lookups answered per multi-get.
+    def batching_ratio(self):
+        return self.get_calls / self.get_batches if self.get_batches else 0.0
+
+# One simulated client issuing random operations, as in the optimized stress test.
+async def _stress_client(store, operations, stress_size, categories, latencies):
+    for _ in range(operations):
+        oper_type = random.choice(["add", "get", "get", "remove", "filter"])
+        product_id = random.randint(1, stress_size)
+        start_time = time.perf_counter()
+        if oper_type == "add":
+            await store.add_product(product_id, f"UpdatedStressProduct_{product_id}", random.uniform(1, 1000),
+                                    random.randint(1, 100), random.choice(categories))
+        elif oper_type == "get":
+            await store.get_product(product_id)
+        elif oper_type == "remove":
+            await store.remove_product(product_id)
+        elif oper_type == "filter":
+            await store.filter_product_ids(category=random.choice(categories), min_price=random.uniform(1, 500))
+        latencies.append(time.perf_counter() - start_time)
+
+# Async stress test: many concurrent clients against one AsyncInventory, while a heartbeat task measures
+# how long the event loop is blocked.
+async def _run_async_stress(stress_size, clients, operations):
+    categories = ["Lounge", "Chairs", "Tables", "Case Goods"]
+    async with AsyncInventory() as store:
+        await store.bulk_upsert([(i + 1, f"StressProduct: {i + 1}", random.uniform(1, 1000), random.randint(1, 100),
+                                  random.choice(categories)) for i in range(stress_size)])
+        await store.warm_up()
+
+        # Concurrent lookups come back as one multi-get with the same answers as direct lookups.
+        sample = random.sample(range(1, stress_size + 1), 100)
+        found = await asyncio.gather(*(store.get_product(product_id) for product_id in sample))
+        assert found == [store.inventory.get_product(product_id) for product_id in sample], \
+            "Async Stress Test Failed: Batched lookups differ."
+        assert store.get_batches == 1, "Async Stress Test Failed: Lookups were not batched."
+        await store.add_product(stress_size + 1, "AttributedProduct", 10.0, 1, categories[0], supplier='Acme')
+        assert (await store.get_product(stress_size + 1)).data['supplier'] == 'Acme', \
+            "Async Stress Test Failed: Extra attributes dropped."
+        latencies = []
+        stalls = []
+        running = True
+
+        async def heartbeat():
+            while running:
+                tick = time.perf_counter()
+                await asyncio.sleep(0.001)
+                stalls.append(time.perf_counter() - tick - 0.001)
+
+        monitor = asyncio.create_task(heartbeat())
+        start_time = time.perf_counter()
+        await asyncio.gather(*(_stress_client(store, operations, stress_size, categories, latencies)
+                               for _ in range(clients)))
+        elapsed = time.perf_counter() - start_time
+        running = False
+        await monitor
+
+        latencies.sort()
+        total = clients * operations
+        print(f"{total} operations from {clients} clients in {elapsed * 1000} ms ({total / elapsed:.0f} ops/sec).")
+        print(f"Latency p50: {latencies[len(latencies) // 2] * 1000} ms, p99: {latencies[int(len(latencies) * 0.99)] * 1000} ms.")
+        print(f"Lookups per multi-get: {store.batching_ratio():.1f}, longest event loop stall: {max(stalls) * 1000} ms.")
+        assert len(latencies) == total, "Async Stress Test Failed: Missing operations."
+
+def run_async_stress_testing(stress_size=200000, clients=50, operations=100):
+    print("---Async Stress Testing---")
+    asyncio.run(_run_async_stress(stress_size, clients, operations))
+
+# Main function to demonstrate the async inventory.
+
+if __name__ == "__main__":
+    run_async_stress_testing()
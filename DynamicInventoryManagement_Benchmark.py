@@ -0,0 +1,209 @@
+"""
+Project 1: Data Structure Design and Implementation
+Dynamic Inventory Management System - Benchmark.
+
+Reproducible benchmark comparing the original and optimized inventories on the same seeded workloads.
+Every trial loads the same products into a fresh inventory, warms up, then times a pre-generated operation list,
+reporting ops/sec and per-operation latency percentiles. Results can be written as JSON to track regressions.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+
+import DynamicInventoryManagement as original
+import DynamicInventoryManagement_Optimized as optimized
+
+CATEGORIES = ["Lounge", "Chairs", "Tables", "Case Goods"]
+
+# Inventory factories under test. Each entry is (build, load, load_method): build() creates an empty inventory,
+# load(inventory, rows) fills it the fastest way that implementation offers, and load_method names that path
+# since load times of different paths are not comparable.
+def _load_by_add(inventory, rows):
+    for row in rows:
+        inventory.add_product(*row)
+
+# The warm-up posts the name n-grams inside the timed load, so no timed operation pays for them.
+def _bulk_load(inventory, rows):
+    inventory.bulk_load(rows)
+    inventory.warm_up()
+
+IMPLEMENTATIONS = {
+    'original': (original.Inventory, _load_by_add, 'add_product loop'),
+    'optimized': (optimized.Inventory, _bulk_load, 'bulk_load + warm_up'),
+    'optimized-columnar': (lambda: optimized.Inventory('columnar'), _bulk_load, 'bulk_load + warm_up'),
+}
+
+# Operation mix per workload, as relative weights.
+WORKLOADS = {
+    'read-heavy': {'get': 90, 'update_quantity': 5, 'update_price': 5},
+    'write-heavy': {'add': 40, 'update_quantity': 25, 'update_price': 20, 'remove': 15},
+    'filter-heavy': {'filter': 90, 'get': 10},
+    'mixed': {'get': 50, 'add': 15, 'update_quantity': 10, 'update_price': 10, 'remove': 5, 'filter': 10},
+}
+
+# Seeded product rows, identical for every implementation.
+def make_rows(size, seed):
+    rng = random.Random(seed)
+    return [(i + 1, f"Product : {i + 1}", round(rng.uniform(10, 1000), 2), rng.randint(0, 100), rng.choice(CATEGORIES))
+            for i in range(size)]
+
+# Helper drawing random filter criteria: category, price range, keyword or a combination.
+def _filter_args(rng):
+    kind = rng.choice(['category', 'price', 'keyword', 'combined'])
+    if kind == 'category':
+        return {'category': rng.choice(CATEGORIES)}
+    low = rng.uniform(10, 900)
+    if kind == 'price':
+        return {'min_price': low, 'max_price': low + 50}
+    if kind == 'keyword':
+        return {'name_keyword': f": {rng.randint(1, 999)}"}
+    return {'category': rng.choice(CATEGORIES), 'min_price': low, 'max_quantity': rng.randint(10, 60)}
+
+# Seeded list of (op, args, kwargs) for a workload, generated up front so only the operations are timed.
+def make_operations(workload, size, count, seed):
+    rng = random.Random(seed)
+    ops, weights = zip(*WORKLOADS[workload].items())
+    operations = []
+    for op in rng.choices(ops, weights, k=count):
+        # Adds reach 10% past the loaded ids so some insert new products and some update existing ones.
+        product_id = rng.randint(1, size + size // 10 + 1)
+        if op == 'get':
+            operations.append(('get_product', (product_id,), {}))
+        elif op == 'add':
+            operations.append(('add_product', (product_id, f"Product : {product_id}", round(rng.uniform(10, 1000), 2),
+                                               rng.randint(0, 100), rng.choice(CATEGORIES)), {}))
+        elif op == 'update_quantity':
+            operations.append(('update_quantity', (product_id, rng.randint(-10, 10)), {}))
+        elif op == 'update_price':
+            operations.append(('update_price', (product_id, round(rng.uniform(10, 1000), 2)), {}))
+        elif op == 'remove':
+            operations.append(('remove_product', (product_id,), {}))
+        else:
+            operations.append(('filter_products', (), _filter_args(rng)))
+    return operations
+
+# Nearest-rank percentile of an already sorted list.
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+# Helper running operations until the list ends or the time budget is spent. Returns per-operation latencies.
+def _run_trial(inventory, operations, budget):
+    latencies = []
+    perf_counter = time.perf_counter
+    deadline = perf_counter() + budget
+    for method, args, kwargs in operations:
+        call = getattr(inventory, method)
+        start = perf_counter()
+        call(*args, **kwargs)
+        end = perf_counter()
+        latencies.append(end - start)
+        if end > deadline:
+            break
+    return latencies
+
+# Benchmark one implementation on one workload and size. The original inventory prints on updates and removals,
+# so stdout is discarded while operations run.
+def benchmark(implementation, workload, size, operations=1000, trials=5, warmup=200, seed=42, trial_seconds=5.0):
+    build, load, load_method = IMPLEMENTATIONS[implementation]
+    rows = make_rows(size, seed)
+    ops = make_operations(workload, size, operations, seed + 1)
+    warmup_ops = make_operations(workload, size, warmup, seed + 2)
+    load_times = []
+    trial_latencies = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(trials):
+            # Each trial gets a freshly loaded and warmed up inventory, so every trial replays the operations on the
+            # same state instead of one the earlier trials changed. Only the operations are timed.
+            inventory = build()
+            start = time.perf_counter()
+            load(inventory, rows)
+            load_times.append(time.perf_counter() - start)
+            _run_trial(inventory, warmup_ops, trial_seconds)
+            trial_latencies.append(_run_trial(inventory, ops, trial_seconds))
+            del inventory
+    load_seconds = statistics.median(load_times)
+
+    all_latencies = sorted(latency for latencies in trial_latencies for latency in latencies)
+    trial_rates = [len(latencies) / sum(latencies) for latencies in trial_latencies]
+    return {
+        'implementation': implementation, 'workload': workload, 'size': size, 'load_method': load_method,
+        'load_seconds': load_seconds, 'load_rows_per_sec': size / load_seconds if load_seconds > 0 else None,
+        'trials': [{'ops': len(latencies), 'seconds': sum(latencies), 'ops_per_sec': rate}
+                   for latencies, rate in zip(trial_latencies, trial_rates)],
+        'ops_per_sec': statistics.median(trial_rates),
+        'ops_per_sec_stdev': statistics.stdev(trial_rates) if len(trial_rates) > 1 else 0.0,
+        'latency_ms': {'mean': statistics.fmean(all_latencies) * 1000,
+                       'p50': _percentile(all_latencies, 0.50) * 1000,
+                       'p95': _percentile(all_latencies, 0.95) * 1000,
+                       'p99': _percentile(all_latencies, 0.99) * 1000,
+                       'max': all_latencies[-1] * 1000},
+    }
+
+# Helper recording where and on what the benchmark ran, so JSON files from different commits can be compared.
+def _environment(seed):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'commit': commit, 'seed': seed,
+            'numpy': optimized.np is not None}
+
+# Run every implementation, workload and size combination and print a summary table.
+def run_benchmark_suite(sizes=(1000, 10000, 100000, 1000000), workloads=tuple(WORKLOADS),
+                        implementations=tuple(IMPLEMENTATIONS), operations=1000, trials=5, warmup=200,
+                        seed=42, trial_seconds=5.0, json_path=None):
+    print("---Benchmark Suite---")
+    report = {'environment': _environment(seed),
+              'settings': {'operations': operations, 'trials': trials, 'warmup': warmup, 'trial_seconds': trial_seconds},
+              'results': []}
+    for size in sizes:
+        for workload in workloads:
+            rates = {}
+            load_seconds = {}
+            for implementation in implementations:
+                result = benchmark(implementation, workload, size, operations, trials, warmup, seed, trial_seconds)
+                report['results'].append(result)
+                rates[implementation] = result['ops_per_sec']
+                load_seconds[implementation] = result['load_seconds']
+                latency = result['latency_ms']
+                print(f"{size:>8} {workload:<13} {implementation:<19} {result['ops_per_sec']:>12.0f} ops/sec  "
+                      f"p50 {latency['p50']:.4f} ms  p95 {latency['p95']:.4f} ms  p99 {latency['p99']:.4f} ms  "
+                      f"load {result['load_seconds'] * 1000:.0f} ms ({result['load_method']})")
+            if 'original' in rates:
+                for implementation, rate in rates.items():
+                    if implementation != 'original':
+                        print(f"{'':>8} {workload:<13} {implementation} speedup over original: {rate / rates['original']:.1f}x, "
+                              f"load time {load_seconds[implementation] / load_seconds['original']:.1f}x the original "
+                              f"add_product loop")
+    if json_path:
+        with open(json_path, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Results written to {json_path}.")
+    return report
+
+# Main function to run the benchmark suite from the command line.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the original and optimized inventories.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument('--implementations', nargs='+', choices=list(IMPLEMENTATIONS), default=list(IMPLEMENTATIONS))
+    parser.add_argument('--operations', type=int, default=1000)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--trial-seconds', type=float, default=5.0)
+    parser.add_argument('--json', dest='json_path')
+    options = parser.parse_args()
+    run_benchmark_suite(options.sizes, options.workloads, options.implementations, options.operations,
+                        options.trials, options.warmup, options.seed, options.trial_seconds, options.json_path)
@@ -0,0 +1,290 @@
+"""
+Project 1: Data Structure Design and Implementation
+Dynamic Inventory Management System - IO.
+
+Streaming import and export of catalog feeds as CSV or as a compact binary columnar file. Files are read in
+chunks of rows so memory stays bounded whatever the file size, each chunk is turned into columns and handed
+straight to Inventory.bulk_upsert, and CSV chunks can be parsed in parallel by worker processes.
+"""
+import csv
+import marshal
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from array import array
+from collections import deque
+from itertools import islice
+
+from DynamicInventoryManagement_Optimized import PRODUCT_FIELDS, ColumnarProductStore, Inventory
+from DynamicInventoryManagement_Persistence import product_rows
+
+COLUMNAR_MAGIC = b'INVCOLS1'
+CHUNK_ROWS = 100000
+
+# Helper listing the extra attribute names used by any product, in sorted order.
+def _extra_fields(inventory):
+    products = inventory.products
+    fields = set()
+    if isinstance(products, ColumnarProductStore):
+        for attributes in products.attributes.values():
+            fields.update(attributes)
+    else:
+        for product in products.values():
+            data = product.data
+            if len(data) > len(PRODUCT_FIELDS):
+                fields.update(field for field in data if field not in PRODUCT_FIELDS)
+    return sorted(fields)
+
+# Helper turning parsed columns into what bulk_upsert takes: the column dictionary itself when there are no
+# extra attributes, otherwise rows with an attributes dictionary that leaves out missing values.
+def _bulk_data(columns):
+    extra_fields = [field for field in columns if field not in PRODUCT_FIELDS]
+    if not extra_fields:
+        return columns
+    core = zip(*(columns[field] for field in PRODUCT_FIELDS))
+    extras = zip(*(columns[field] for field in extra_fields))
+    return [row + ({field: value for field, value in zip(extra_fields, values) if value is not None and value != ''},)
+            for row, values in zip(core, extras)]
+
+# Helper turning CSV records into typed columns, product_id through id_type, price and quantity as numbers and
+# extra attributes as strings.
+def _records_to_columns(records, header, id_type):
+    records = [record for record in records if record]
+    if not records:
+        return None
+    width = len(header)
+    if any(len(record) != width for record in records):
+        raise ValueError(f"CSV rows must have {width} columns like the header.")
+    values = dict(zip(header, zip(*records)))
+    columns = {'product_id': list(map(id_type, values['product_id'])),
+               'name': list(values['name']),
+               'price': list(map(float, values['price'])),
+               'quantity': list(map(int, values['quantity'])),
+               'category': list(values['category'])}
+    for field in header:
+        if field not in columns:
+            columns[field] = values[field]
+    return columns
+
+# Parse CSV lines (without the header) into typed columns. Module level so worker processes can run it.
+def parse_csv_chunk(lines, header, delimiter=',', id_type=int):
+    return _records_to_columns(list(csv.reader(lines, delimiter=delimiter)), header, id_type)
+
+# Helper yielding parsed chunks in file order. With workers, up to two chunks per worker are parsed ahead while
+# the caller loads the previous one, so memory stays bounded. Parallel parsing splits the file on line breaks,
+# so quoted values must not contain newlines.
+def _parsed_chunks(handle, header, chunk_rows, workers, delimiter, id_type):
+    if not workers:
+        reader = csv.reader(handle, delimiter=delimiter)
+        while True:
+            records = list(islice(reader, chunk_rows))
+            if not records:
+                return
+            columns = _records_to_columns(records, header, id_type)
+            if columns is not None:
+                yield columns
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        while True:
+            lines = list(islice(handle, chunk_rows))
+            if lines:
+                pending.append(pool.apply_async(parse_csv_chunk, (lines, header, delimiter, id_type)))
+            if pending and (not lines or len(pending) >= 2 * workers):
+                columns = pending.popleft().get()
+                if columns is not None:
+                    yield columns
+            elif not lines:
+                return
+
+# Helper loading parsed chunks into inventory, replacing its products first when replace is True.
+# Returns the row count, chunk count and the overall ingest rate.
+def _load_chunks(inventory, chunks, replace):
+    start_time = time.perf_counter()
+    if replace:
+        inventory.bulk_load([])
+    rows = 0
+    chunk_count = 0
+    for columns in chunks:
+        inventory.bulk_upsert(_bulk_data(columns))
+        rows += len(columns['product_id'])
+        chunk_count += 1
+    elapsed = time.perf_counter() - start_time
+    return {'rows': rows, 'chunks': chunk_count, 'seconds': elapsed,
+            'rows_per_sec': rows / elapsed if elapsed > 0 else float('inf')}
+
+# Import a CSV file with a header naming at least the product fields, other columns become extra attributes
+# (left out where empty). workers > 0 parses chunks in that many processes while the inventory loads.
+def import_csv(inventory, path, chunk_rows=CHUNK_ROWS, workers=0, replace=False, delimiter=',', id_type=int):
+    with open(path, newline='', encoding='utf-8') as handle:
+        header = next(csv.reader([handle.readline()], delimiter=delimiter), None)
+        if header is None:
+            raise ValueError(f"{path} has no CSV header.")
+        header = [field.strip() for field in header]
+        missing = [field for field in PRODUCT_FIELDS if field not in header]
+        if missing:
+            raise ValueError(f"{path} is missing the columns {missing}.")
+        return _load_chunks(inventory, _parsed_chunks(handle, header, chunk_rows, workers, delimiter, id_type),
+                            replace)
+
+# Export every product as CSV, the product fields first and then one column per extra attribute.
+def export_csv(inventory, path, chunk_rows=CHUNK_ROWS, delimiter=','):
+    start_time = time.perf_counter()
+    extra_fields = _extra_fields(inventory)
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle, delimiter=delimiter)
+        writer.writerow(PRODUCT_FIELDS + tuple(extra_fields))
+        source = iter(product_rows(inventory))
+        while True:
+            chunk = list(islice(source, chunk_rows))
+            if not chunk:
+                break
+            if extra_fields:
+                chunk = [row[:5] + tuple(row[5].get(field, '') if len(row) > 5 else '' for field in extra_fields)
+                         for row in chunk]
+            writer.writerows(chunk)
+            rows += len(chunk)
+    elapsed = time.perf_counter() - start_time
+    return {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rows / elapsed if elapsed > 0 else float('inf')}
+
+# Binary columnar file: COLUMNAR_MAGIC, the list of extra attribute names, then one marshalled record per chunk
+# holding (ids, names, price bytes, quantity bytes, category code bytes, category names, extra columns) and
+# None at the end. Prices are float64 and quantities int64 arrays, categories are stored once per chunk.
+def export_columnar(inventory, path, chunk_rows=CHUNK_ROWS):
+    start_time = time.perf_counter()
+    extra_fields = _extra_fields(inventory)
+    rows = 0
+    with open(path, 'wb') as handle:
+        handle.write(COLUMNAR_MAGIC)
+        marshal.dump(extra_fields, handle)
+        source = iter(product_rows(inventory))
+        while True:
+            chunk = list(islice(source, chunk_rows))
+            if not chunk:
+                break
+            category_lookup = {}
+            codes = array('I', [category_lookup.setdefault(row[4], len(category_lookup)) for row in chunk])
+            extras = [[row[5].get(field) if len(row) > 5 else None for row in chunk] for field in extra_fields]
+            marshal.dump(([row[0] for row in chunk], [row[1] for row in chunk],
+                          array('d', [row[2] for row in chunk]).tobytes(),
+                          array('q', [row[3] for row in chunk]).tobytes(),
+                          codes.tobytes(), list(category_lookup), extras), handle)
+            rows += len(chunk)
+        marshal.dump(None, handle)
+    elapsed = time.perf_counter() - start_time
+    return {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rows / elapsed if elapsed > 0 else float('inf')}
+
+# Helper yielding the chunks of a binary columnar file as columns.
+def _columnar_chunks(handle, extra_fields):
+    while True:
+        record = marshal.load(handle)
+        if record is None:
+            return
+        ids, names, price_bytes, quantity_bytes, code_bytes, categories, extras = record
+        prices = array('d')
+        prices.frombytes(price_bytes)
+        quantities = array('q')
+        quantities.frombytes(quantity_bytes)
+        codes = array('I')
+        codes.frombytes(code_bytes)
+        columns = {'product_id': ids, 'name': names, 'price': prices.tolist(), 'quantity': quantities.tolist(),
+                   'category': [categories[code] for code in codes]}
+        columns.update(zip(extra_fields, extras))
+        yield columns
+
+# Import a file written by export_columnar.
+def import_columnar(inventory, path, replace=False):
+    with open(path, 'rb') as handle:
+        if handle.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not an inventory columnar file.")
+        extra_fields = marshal.load(handle)
+        return _load_chunks(inventory, _columnar_chunks(handle, extra_fields), replace)
+
+# Demonstrate the import and export pipeline and measure its throughput.
+def run_io_testing(sizes=(100000, 500000)):
+    print("---Import and Export Testing---")
+    directory = tempfile.mkdtemp(prefix='inventory_io_')
+    categories = ["Lounge", "Chairs", "Tables", "Case Goods"]
+    csv_path = os.path.join(directory, 'catalog.csv')
+    columnar_path = os.path.join(directory, 'catalog.cols')
+    try:
+        # Test Case 1: CSV round trip keeps every field and extra attribute.
+        print("Test Case 1: CSV round trip.")
+        source = Inventory()
+        source.add_product(1, "Three-seater Sofa", 1899.99, 10, "Lounge", supplier="Knoll")
+        source.add_product(2, 'Desk Chair, "Mesh"', 389.99, 25, "Chairs")
+        source.add_product(3, "Dining Table", 1200.00, 5, "Tables", supplier="Herman Miller", location="B2")
+        export_csv(source, csv_path)
+        copied = Inventory('columnar')
+        assert import_csv(copied, csv_path)['rows'] == 3, "Test Case 1 Failed: Row count."
+        assert sorted(product_rows(copied)) == sorted(product_rows(source)), "Test Case 1 Failed: Products differ."
+        print("Test Case 1 Passed.")
+
+        # Test Case 2: Binary columnar round trip.
+        print("Test Case 2: Columnar round trip.")
+        export_columnar(source, columnar_path)
+        copied = Inventory('compact')
+        import_columnar(copied, columnar_path)
+        assert sorted(product_rows(copied)) == sorted(product_rows(source)), "Test Case 2 Failed: Products differ."
+        print("Test Case 2 Passed.")
+
+        # Test Case 3: Parallel parsing in small chunks gives the same inventory, replace drops old products.
+        print("Test Case 3: Parallel chunked import.")
+        bulk = Inventory()
+        bulk.bulk_load([(i + 1, f"Product : {i + 1}", round(random.uniform(10, 1000), 2), random.randint(0, 100),
+                         random.choice(categories)) for i in range(5000)])
+        export_csv(bulk, csv_path)
+        copied = Inventory()
+        copied.add_product(99999, "Old Product", 10.0, 1, "Lounge")
+        stats = import_csv(copied, csv_path, chunk_rows=700, workers=2, replace=True)
+        assert stats['chunks'] == 8 and copied.get_product(99999) is None, "Test Case 3 Failed: Chunks or replace."
+        assert sorted(product_rows(copied)) == sorted(product_rows(bulk)), "Test Case 3 Failed: Products differ."
+        print("Test Case 3 Passed.")
+
+        # Test Case 4: Imports leave name trigrams to the first search, which must still see every imported name.
+        print("Test Case 4: Name search right after an import.")
+        expected = sorted(row[0] for row in product_rows(bulk) if ": 12" in row[1])
+        assert copied.name_index.pending and sorted(copied.filter_product_ids(name_keyword=": 12")) == expected, "Test Case 4 Failed: Imported names."
+        copied.bulk_upsert([(6001, "Product : 12 Extra", 10.0, 1, "Lounge"), (6002, "Product : 120 Extra", 10.0, 1, "Lounge")])
+        copied.remove_product(6002)
+        copied.remove_product(12)
+        expected = sorted(set(expected) - {12} | {6001})
+        assert sorted(product.product_id for product in copied.search_names(": 12")) == expected, "Test Case 4 Failed: Upserted names."
+        assert [product.product_id for product in copied.search_names("xt")] == [6001], "Test Case 4 Failed: Short keyword."
+        print("Test Case 4 Passed.")
+
+        # Throughput of each step at larger sizes.
+        for size in sizes:
+            print(f"\nTesting import and export for {size} products.")
+            rows = [(i + 1, f"Product : {i + 1}", round(random.uniform(10, 1000), 2), random.randint(0, 100),
+                     random.choice(categories)) for i in range(size)]
+            catalog = Inventory()
+            catalog.bulk_load(rows)
+            del rows
+            for name, export, path in (('CSV', export_csv, csv_path), ('Columnar', export_columnar, columnar_path)):
+                stats = export(catalog, path)
+                print(f"{name} export: {stats['rows_per_sec']:.0f} rows/sec, {os.path.getsize(path) / size:.1f} bytes/row.")
+
+            start_time = time.perf_counter()
+            with open(csv_path, newline='', encoding='utf-8') as handle:
+                header = next(csv.reader(handle))
+                parsed = sum(len(columns['product_id'])
+                             for columns in _parsed_chunks(handle, header, CHUNK_ROWS, 0, ',', int))
+            elapsed = time.perf_counter() - start_time
+            print(f"CSV parse only: {parsed / elapsed:.0f} rows/sec.")
+            for storage in ('dict', 'columnar'):
+                stats = import_csv(Inventory(storage), csv_path)
+                print(f"CSV import ({storage}): {stats['rows_per_sec']:.0f} rows/sec.")
+                stats = import_columnar(Inventory(storage), columnar_path)
+                print(f"Columnar import ({storage}): {stats['rows_per_sec']:.0f} rows/sec.")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+# Main function to demonstrate importing and exporting catalogs.
+
+if __name__ == "__main__":
+    run_io_testing()
@@ -0,0 +1,236 @@
+"""
+Project 1: Data Structure Design and Implementation
+Dynamic Inventory Management System - Metrics.
+
+Opt-in instrumentation for an inventory: call counts, errors and latency histograms per method, the query plan
+picked for every filter with candidates scanned versus rows returned, index hit rates and query cache statistics.
+Methods are wrapped on the instance only while instrumented, so an inventory that is not instrumented runs the
+plain class methods. Snapshots are handed to pluggable exporters.
+"""
+import json
+import random
+import threading
+import time
+from functools import wraps
+
+from DynamicInventoryManagement_Optimized import generate_large_ds
+
+# Methods timed by default. _modify_product is included to show the reindexing cost of in-place changes,
+# category moves among them.
+INSTRUMENTED_METHODS = ('add_product', 'remove_product', 'update_price', 'update_quantity', 'get_product',
+                        'get_products', 'list_products', 'filter_products', 'filter_product_ids', 'search_names',
+                        'bulk_upsert', 'bulk_load', 'compact', '_modify_product')
+
+# Latency histogram with power of two buckets in microseconds: bucket i holds calls faster than 2**i us.
+class LatencyHistogram:
+    bucket_count = 32
+
+    def __init__(self):
+        self.counts = [0] * self.bucket_count
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        bucket = int(seconds * 1000000).bit_length()
+        self.counts[min(bucket, self.bucket_count - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    # Upper bound in seconds of the bucket holding the given fraction of calls.
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(2 ** bucket / 1000000, self.max)
+        return self.max
+
+    def summary(self):
+        return {'calls': self.count, 'total_ms': self.total * 1000,
+                'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+                'p50_ms': self.percentile(0.50) * 1000, 'p99_ms': self.percentile(0.99) * 1000,
+                'max_ms': self.max * 1000,
+                'buckets_us': {2 ** bucket: count for bucket, count in enumerate(self.counts) if count}}
+
+# Counters filled by an instrumented inventory. Safe to share between threads.
+class InventoryMetrics:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        # Per plan: [queries, estimated candidates scanned, rows returned].
+        self.plans = {}
+        self.exporters = []
+        self.inventory = None
+        self.lock = threading.Lock()
+
+    def record_call(self, method, seconds, failed=False):
+        with self.lock:
+            histogram = self.latencies.get(method)
+            if histogram is None:
+                histogram = self.latencies[method] = LatencyHistogram()
+            histogram.record(seconds)
+            if failed:
+                self.errors[method] = self.errors.get(method, 0) + 1
+
+    # Plan observer, see Inventory.plan_observer.
+    def record_plan(self, plan, scanned, returned):
+        with self.lock:
+            counters = self.plans.get(plan)
+            if counters is None:
+                counters = self.plans[plan] = [0, 0, 0]
+            counters[0] += 1
+            counters[1] += scanned
+            counters[2] += returned
+
+    def reset(self):
+        with self.lock:
+            self.latencies.clear()
+            self.errors.clear()
+            self.plans.clear()
+
+    # Register exporter(snapshot) called by export.
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter):
+        self.exporters.remove(exporter)
+
+    # Point in time copy of every counter as plain dictionaries.
+    def snapshot(self):
+        with self.lock:
+            methods = {}
+            for method, histogram in self.latencies.items():
+                methods[method] = histogram.summary()
+                methods[method]['errors'] = self.errors.get(method, 0)
+            plans = {plan: {'queries': queries, 'scanned': scanned, 'returned': returned}
+                     for plan, (queries, scanned, returned) in self.plans.items()}
+        queries = sum(entry['queries'] for entry in plans.values())
+        scanned = sum(entry['scanned'] for entry in plans.values())
+        returned = sum(entry['returned'] for entry in plans.values())
+        # Queries answered from an index (or the vectorized pass) rather than a full scan.
+        indexed = queries - plans.get('scan', {}).get('queries', 0)
+        cache = self.inventory.query_cache if self.inventory is not None else None
+        return {'timestamp': time.time(), 'methods': methods, 'plans': plans,
+                'index_hit_rate': indexed / queries if queries else 0.0,
+                'scan_efficiency': returned / scanned if scanned else 0.0,
+                'query_cache': cache.stats() if cache is not None else None}
+
+    # Hand a snapshot to every exporter and return it.
+    def export(self):
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            exporter(snapshot)
+        return snapshot
+
+# Exporter printing one line per method and plan.
+def print_exporter(snapshot):
+    for method, summary in sorted(snapshot['methods'].items()):
+        print(f"{method}: {summary['calls']} calls, mean {summary['mean_ms']:.4f} ms, p50 {summary['p50_ms']:.4f} ms, "
+              f"p99 {summary['p99_ms']:.4f} ms, max {summary['max_ms']:.4f} ms, {summary['errors']} errors")
+    for plan, entry in sorted(snapshot['plans'].items()):
+        print(f"plan {plan}: {entry['queries']} queries, {entry['scanned']} scanned, {entry['returned']} returned")
+    print(f"Index hit rate: {snapshot['index_hit_rate']:.2%}, scan efficiency: {snapshot['scan_efficiency']:.2%}")
+
+# Exporter appending each snapshot as one JSON line to a file.
+class JsonLinesExporter:
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, snapshot):
+        with open(self.path, 'a') as handle:
+            handle.write(json.dumps(snapshot) + "\n")
+
+# Helper wrapping one bound method so every call is timed.
+def _timed(metrics, name, method):
+    perf_counter = time.perf_counter
+
+    @wraps(method)
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            metrics.record_call(name, perf_counter() - start, failed=True)
+            raise
+        metrics.record_call(name, perf_counter() - start)
+        return result
+    return timed
+
+# Start collecting metrics for an inventory. The methods are replaced on this instance only, internal calls
+# through self (such as _modify_product) are timed too. Returns the metrics.
+def instrument(inventory, metrics=None, methods=INSTRUMENTED_METHODS):
+    if getattr(inventory, 'metrics', None) is not None:
+        uninstrument(inventory)
+    metrics = metrics if metrics is not None else InventoryMetrics()
+    metrics.inventory = inventory
+    for name in methods:
+        setattr(inventory, name, _timed(metrics, name, getattr(inventory, name)))
+    inventory.instrumented_methods = tuple(methods)
+    inventory.plan_observer = metrics.record_plan
+    inventory.metrics = metrics
+    return metrics
+
+# Stop collecting, the inventory goes back to the plain class methods. Returns the metrics collected so far.
+def uninstrument(inventory):
+    metrics = getattr(inventory, 'metrics', None)
+    if metrics is None:
+        return None
+    for name in inventory.instrumented_methods:
+        del inventory.__dict__[name]
+    inventory.plan_observer = None
+    inventory.metrics = None
+    return metrics
+
+# Demonstrate the metrics on a mixed workload and measure the instrumentation overhead.
+def run_metrics_testing(size=100000, operations=20000):
+    print("---Metrics Testing---")
+    categories = ["Lounge", "Chairs", "Tables", "Case Goods"]
+    inventory = generate_large_ds(size)
+    ops = [(random.choice(["add", "get", "get", "get", "update", "filter"]), random.randint(1, size))
+           for _ in range(operations)]
+
+    def workload():
+        start_time = time.perf_counter()
+        for oper_type, product_id in ops:
+            if oper_type == "add":
+                inventory.add_product(product_id, f"Product : {product_id}", random.uniform(10, 1000),
+                                      random.randint(0, 100), random.choice(categories))
+            elif oper_type == "get":
+                inventory.get_product(product_id)
+            elif oper_type == "update":
+                inventory.update_quantity(product_id, random.randint(-5, 5))
+            else:
+                inventory.filter_product_ids(category=random.choice(categories), min_price=random.uniform(900, 1000))
+        return time.perf_counter() - start_time
+
+    plain = workload()
+    metrics = instrument(inventory)
+    measured = workload()
+    snapshot = metrics.snapshot()
+    print_exporter(snapshot)
+    print(f"Plain: {plain * 1000} ms, instrumented: {measured * 1000} ms ({(measured / plain - 1) * 100:.1f}% overhead).")
+
+    # Test Case 1: every call counted and every filter planned.
+    filters = sum(1 for oper_type, _ in ops if oper_type == "filter")
+    assert snapshot['methods']['filter_product_ids']['calls'] == filters, "Test Case 1 Failed: Filter calls not counted."
+    assert sum(entry['queries'] for entry in snapshot['plans'].values()) == filters, "Test Case 1 Failed: Plans not recorded."
+    assert snapshot['methods']['get_product']['calls'] == sum(1 for oper_type, _ in ops if oper_type == "get"), \
+        "Test Case 1 Failed: Lookups not counted."
+
+    # Test Case 2: uninstrumented inventories run the class methods again.
+    uninstrument(inventory)
+    assert 'get_product' not in vars(inventory) and inventory.plan_observer is None, "Test Case 2 Failed: Wrappers left behind."
+    inventory.filter_product_ids(category="Lounge")
+    assert metrics.snapshot()['plans'] == snapshot['plans'], "Test Case 2 Failed: Metrics still collected."
+    print("Metrics test cases passed.")
+
+# Main function to demonstrate the inventory metrics.
+
+if __name__ == "__main__":
+    run_metrics_testing()
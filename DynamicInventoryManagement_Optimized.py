@@ -8,15 +8,66 @@ Changes include using more efficient data structures and adding a performance an
 ## Adding additional packages for performance testing.
 import time
 import random
+import heapq
 import sys
-from collections import defaultdict
+import gc
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from functools import partial, wraps
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, defaultdict, deque
+from collections.abc import MutableMapping
+from itertools import chain, count, islice
+from operator import index, itemgetter
+
+# NumPy is optional, it enables the vectorized filter path for columnar storage.
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Increase  recursion limit for deep recursion.
 sys.setrecursionlimit(20000)
 
+# Fields every product has. Products may carry extra attributes (supplier, location, ...) next to them.
+PRODUCT_FIELDS = ('product_id', 'name', 'price', 'quantity', 'category')
+
+# Extra attributes of a product, the fields of its data beyond PRODUCT_FIELDS.
+def extra_attributes(data):
+    if len(data) == len(PRODUCT_FIELDS) and 'product_id' in data:
+        return {}
+    return {field: value for field, value in data.items() if field not in PRODUCT_FIELDS}
+
+# Bytes held by the tables and arrays of containers themselves, not by the objects they hold.
+def _sizeof(containers):
+    return sum(map(sys.getsizeof, containers))
+
+# Pause the cyclic garbage collector while a large batch of objects is built, when pause is true. Wrappers for a big
+# result hold no cycles, but each collection their allocation sets off walks every object already in the result.
+@contextmanager
+def _collector_paused(pause=True):
+    if not pause or not gc.isenabled():
+        yield
+        return
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+# Interned copy of a category string, so every product of the category shares one. Other categories
+# (None, numbers, ...) are kept as they are, sys.intern only takes exact strings.
+def _intern_category(category):
+    return sys.intern(category) if type(category) is str else category
+
 # Define a class for products in the inventory
 class Product:
-    def __init__(self, product_id, name, price, quantity, category):
+    # No per-instance __dict__, the fields live in data. Also lets CompactProduct drop the dictionaries entirely.
+    __slots__ = ('data', 'product_id')
+
+    def __init__(self, product_id, name, price, quantity, category, **attributes):
         self.data = {
             'product_id' : product_id,
             'name' : name,
@@ -24,6 +75,8 @@ class Product:
             'quantity' : quantity,
             'category' : category
         }
+        if attributes:
+            self.data.update(attributes)
 
         self.product_id =  product_id
 
@@ -37,6 +90,13 @@ class Product:
                 f"Price: {self.data['price']}, Quantity: {self.data['quantity']}, "
                 f"Category: {self.data['category']})")
 
+# Independent copy with its own field dictionary, used by snapshot copy-on-write.
+    def copy(self):
+        clone = Product.__new__(type(self))
+        clone.data = dict(self.data)
+        clone.product_id = self.product_id
+        return clone
+
 # Enabling Product objects to be used as dictionary keys and in sets.
     def __hash__(self):
         return hash(self.product_id)
@@ -47,116 +107,2442 @@ class Product:
             return NotImplemented
         return self.product_id == other.product_id
     
+# Live field mapping over the attributes of a CompactProduct, so code written against product.data keeps working.
+class _SlotRow(MutableMapping):
+    __slots__ = ('product',)
+
+    def __init__(self, product):
+        self.product = product
+
+    def __getitem__(self, field):
+        if field in PRODUCT_FIELDS:
+            return getattr(self.product, field)
+        attributes = self.product.attributes
+        if attributes is None or field not in attributes:
+            raise KeyError(field)
+        return attributes[field]
+
+    def __setitem__(self, field, value):
+        product = self.product
+        if field == 'category':
+            value = _intern_category(value)
+        elif field == 'product_id':
+            raise KeyError(field)
+        elif field not in PRODUCT_FIELDS:
+            if product.attributes is None:
+                product.attributes = {}
+            product.attributes[field] = value
+            return
+        setattr(product, field, value)
+
+    def __delitem__(self, field):
+        attributes = self.product.attributes
+        if field in PRODUCT_FIELDS or attributes is None or field not in attributes:
+            raise TypeError(f"Compact product field '{field}' cannot be deleted.")
+        del attributes[field]
+
+    def __iter__(self):
+        attributes = self.product.attributes
+        return chain(PRODUCT_FIELDS, attributes) if attributes else iter(PRODUCT_FIELDS)
+
+    def __len__(self):
+        attributes = self.product.attributes
+        return len(PRODUCT_FIELDS) + (len(attributes) if attributes else 0)
+
+# Product keeping its fields in slots instead of a data dictionary, with the category string interned so every
+# product of a category shares one string. Hashing, equality and ordering by product id are inherited from Product,
+# data is a live view of the slots.
+class CompactProduct(Product):
+    # attributes holds the extra attributes, None for products without any.
+    __slots__ = ('name', 'price', 'quantity', 'category', 'attributes')
+    fields = PRODUCT_FIELDS
+
+    def __init__(self, product_id, name, price, quantity, category, **attributes):
+        self.product_id = product_id
+        self.name = name
+        self.price = price
+        self.quantity = quantity
+        self.category = _intern_category(category)
+        self.attributes = attributes or None
+
+    @property
+    def data(self):
+        return _SlotRow(self)
+
+    def copy(self):
+        return CompactProduct(self.product_id, self.name, self.price, self.quantity, self.category,
+                              **(self.attributes or {}))
+
+    def __repr__(self):
+        return (f"Product ID: {self.product_id}, Name: {self.name}, "
+                f"Price: {self.price}, Quantity: {self.quantity}, "
+                f"Category: {self.category})")
+
+# Live field mapping for one row of a ColumnarProductStore, reads and writes go straight to the columns.
+class _ColumnarRow(MutableMapping):
+    __slots__ = ('store', 'product_id')
+
+    def __init__(self, store, product_id):
+        self.store = store
+        self.product_id = product_id
+
+    def __getitem__(self, field):
+        store = self.store
+        if field == 'product_id':
+            return self.product_id
+        row = store.rows[self.product_id]
+        if field == 'price':
+            return store.price[row]
+        if field == 'quantity':
+            return store.quantity[row]
+        if field == 'category':
+            return store.categories[store.category_codes[row]]
+        if field == 'name':
+            return store.names[row]
+        return store.attributes[self.product_id][field]
+
+    def __setitem__(self, field, value):
+        store = self.store
+        row = store.rows[self.product_id]
+        if field == 'price':
+            store.price[row] = value
+        elif field == 'quantity':
+            store.quantity[row] = value
+        elif field == 'category':
+            store.category_codes[row] = store.category_code(value)
+        elif field == 'name':
+            store.names[row] = value
+        elif field == 'product_id':
+            raise KeyError(field)
+        else:
+            store.attributes.setdefault(self.product_id, {})[field] = value
+
+    def __delitem__(self, field):
+        attributes = self.store.attributes.get(self.product_id)
+        if field in PRODUCT_FIELDS or attributes is None or field not in attributes:
+            raise TypeError(f"Columnar product field '{field}' cannot be deleted.")
+        del attributes[field]
+
+    def __iter__(self):
+        attributes = self.store.attributes.get(self.product_id)
+        return chain(PRODUCT_FIELDS, attributes) if attributes else iter(PRODUCT_FIELDS)
+
+    def __len__(self):
+        attributes = self.store.attributes.get(self.product_id)
+        return len(PRODUCT_FIELDS) + (len(attributes) if attributes else 0)
+
+# Product backed by a row of a ColumnarProductStore, created on access and never stored. The field view is built
+# when data is read, so a wrapper is a single small object.
+class ColumnarProduct(Product):
+    __slots__ = ('store',)
+
+    def __init__(self, store, product_id):
+        self.store = store
+        self.product_id = product_id
+
+    @property
+    def data(self):
+        return _ColumnarRow(self.store, self.product_id)
+
+    # Detached copy with its own field dictionary, no longer tied to the store.
+    def copy(self):
+        clone = Product.__new__(Product)
+        clone.data = dict(self.data)
+        clone.product_id = self.product_id
+        return clone
+
+# Column oriented product table. Price, quantity and category codes live in contiguous arrays,
+# category strings are stored once in a pool. Behaves like the product_id -> Product dictionary.
+class ColumnarProductStore(MutableMapping):
+    fields = PRODUCT_FIELDS
+
+    def __init__(self):
+        self.clear()
+
+    # Drop every row and the category pool.
+    def clear(self):
+        # Row number per product id, rows stay dense because removal moves the last row into the gap.
+        self.rows = {}
+        self.ids = []
+        self.names = []
+        self.price = array('d')
+        self.quantity = array('q')
+        self.category_codes = array('I')
+        # String pool for categories.
+        self.categories = []
+        self.category_lookup = {}
+        # Extra attributes per product id, only for products that have any.
+        self.attributes = {}
+
+    # Independent copy of every column, an array copy is a single memory copy.
+    def copy(self):
+        clone = ColumnarProductStore.__new__(ColumnarProductStore)
+        clone.rows = dict(self.rows)
+        clone.ids = list(self.ids)
+        clone.names = list(self.names)
+        clone.price = self.price[:]
+        clone.quantity = self.quantity[:]
+        clone.category_codes = self.category_codes[:]
+        clone.categories = list(self.categories)
+        clone.category_lookup = dict(self.category_lookup)
+        clone.attributes = {product_id: dict(attributes) for product_id, attributes in self.attributes.items()}
+        return clone
+
+    # Rebuild the row table, columns and attribute table at their live size. Returns the bytes freed.
+    def compact(self):
+        columns = (self.rows, self.ids, self.names, self.price, self.quantity, self.category_codes, self.attributes)
+        before = _sizeof(columns)
+        self.rows = dict(self.rows)
+        self.ids = list(self.ids)
+        self.names = list(self.names)
+        self.price = self.price[:]
+        self.quantity = self.quantity[:]
+        self.category_codes = self.category_codes[:]
+        self.attributes = dict(self.attributes)
+        return before - _sizeof((self.rows, self.ids, self.names, self.price, self.quantity, self.category_codes,
+                                 self.attributes))
+
+    # Code of a category in the pool, adding it on first use.
+    def category_code(self, category):
+        code = self.category_lookup.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self.category_lookup[category] = code
+        return code
+
+    # Check a price and quantity fit the float64 and int64 columns, so a bad value is rejected before any column
+    # is written. Columnar storage needs integer quantities, a float quantity raises ValueError.
+    @staticmethod
+    def check_values(price, quantity):
+        try:
+            quantity = index(quantity)
+        except TypeError:
+            raise ValueError(f"Columnar storage needs integer quantities, got {quantity!r}.") from None
+        if not -2 ** 63 <= quantity < 2 ** 63:
+            raise ValueError(f"Quantity {quantity} does not fit a 64-bit column.")
+        if not hasattr(price, '__float__'):
+            raise ValueError(f"Columnar storage needs numeric prices, got {price!r}.")
+
+    # Append a row, or overwrite the row if the product id already exists. attributes replaces the extra attributes.
+    def put(self, product_id, name, price, quantity, category, attributes=None):
+        self.check_values(price, quantity)
+        code = self.category_code(category)
+        if attributes:
+            self.attributes[product_id] = dict(attributes)
+        else:
+            self.attributes.pop(product_id, None)
+        row = self.rows.get(product_id)
+        if row is None:
+            self.rows[product_id] = len(self.ids)
+            self.ids.append(product_id)
+            self.names.append(name)
+            self.price.append(price)
+            self.quantity.append(quantity)
+            self.category_codes.append(code)
+        else:
+            self.names[row] = name
+            self.price[row] = price
+            self.quantity[row] = quantity
+            self.category_codes[row] = code
+
+    # Append many (product_id, name, price, quantity, category[, attributes]) rows of new product ids, already
+    # checked with check_values. Each column is extended once.
+    def extend(self, rows):
+        start = len(self.ids)
+        product_ids = [row[0] for row in rows]
+        self.rows.update(zip(product_ids, range(start, start + len(product_ids))))
+        self.ids.extend(product_ids)
+        self.names.extend([row[1] for row in rows])
+        self.price.extend([row[2] for row in rows])
+        self.quantity.extend([row[3] for row in rows])
+        category_code = self.category_code
+        self.category_codes.extend([category_code(row[4]) for row in rows])
+        for row in rows:
+            if len(row) > 5 and row[5]:
+                self.attributes[row[0]] = dict(row[5])
+
+    def __getitem__(self, product_id):
+        if product_id not in self.rows:
+            raise KeyError(product_id)
+        return ColumnarProduct(self, product_id)
+
+    def __setitem__(self, product_id, product):
+        data = product.data
+        self.put(product_id, data['name'], data['price'], data['quantity'], data['category'], extra_attributes(data))
+
+    def __delitem__(self, product_id):
+        row = self.rows.pop(product_id)
+        self.attributes.pop(product_id, None)
+        last = len(self.ids) - 1
+        if row != last:
+            # Move the last row into the freed slot.
+            moved_id = self.ids[last]
+            self.ids[row] = moved_id
+            self.names[row] = self.names[last]
+            self.price[row] = self.price[last]
+            self.quantity[row] = self.quantity[last]
+            self.category_codes[row] = self.category_codes[last]
+            self.rows[moved_id] = row
+        self.ids.pop()
+        self.names.pop()
+        self.price.pop()
+        self.quantity.pop()
+        self.category_codes.pop()
+
+    def __contains__(self, product_id):
+        return product_id in self.rows
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+# Sentinel that sorts after every product id, used as the upper bound in range index searches.
+class _MaxKey:
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+_MAX_KEY = _MaxKey()
+
+# Sorted list split into blocks so inserts and deletes only shift a small block instead of the whole list.
+class SortedKeyList:
+    # Target block size, blocks are split when they grow past twice this size.
+    block_size = 512
+
+    def __init__(self, items=()):
+        self._build(items)
+
+    # Helper to rebuild the blocks from scratch with a single sort.
+    def _build(self, items):
+        items = sorted(items)
+        self._blocks = [items[start:start + self.block_size] for start in range(0, len(items), self.block_size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(items)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def __reversed__(self):
+        for block in reversed(self._blocks):
+            yield from reversed(block)
+
+    # Smallest and largest items, None when the list is empty.
+    def first(self):
+        return self._blocks[0][0] if self._blocks else None
+
+    def last(self):
+        return self._blocks[-1][-1] if self._blocks else None
+
+    # Insert an item keeping the list sorted.
+    def add(self, item):
+        maxes = self._maxes
+        if not maxes:
+            self._blocks.append([item])
+            maxes.append(item)
+        else:
+            pos = bisect_right(maxes, item)
+            if pos == len(maxes):
+                # Larger than everything, append to the last block.
+                pos -= 1
+                block = self._blocks[pos]
+                block.append(item)
+                maxes[pos] = item
+            else:
+                block = self._blocks[pos]
+                insort(block, item)
+            if len(block) > 2 * self.block_size:
+                # Split oversized block in half.
+                half = block[self.block_size:]
+                del block[self.block_size:]
+                maxes[pos] = block[-1]
+                self._blocks.insert(pos + 1, half)
+                maxes.insert(pos + 1, half[-1])
+        self._len += 1
+
+    # Insert many items, large batches are merged with one sort instead of one insert per item.
+    def update(self, items):
+        items = list(items)
+        if len(items) * 4 < self._len:
+            for item in items:
+                self.add(item)
+        elif items:
+            items.extend(self)
+            self._build(items)
+
+    # Rebuild full blocks after removals left them small or sparse. Returns the bytes freed.
+    def compact(self):
+        before = _sizeof(self._blocks) + _sizeof((self._blocks, self._maxes))
+        self._build(list(self))
+        return before - (_sizeof(self._blocks) + _sizeof((self._blocks, self._maxes)))
+
+    # Remove an item, returns False if the item is not in the list.
+    def remove(self, item):
+        pos = bisect_left(self._maxes, item)
+        if pos == len(self._maxes):
+            return False
+        block = self._blocks[pos]
+        idx = bisect_left(block, item)
+        if idx == len(block) or block[idx] != item:
+            return False
+        del block[idx]
+        self._len -= 1
+        if block:
+            self._maxes[pos] = block[-1]
+        else:
+            del self._blocks[pos]
+            del self._maxes[pos]
+        return True
+
+    # Global position of the first item >= item (or > item when right is True).
+    def _position(self, item, right=False):
+        search = bisect_right if right else bisect_left
+        pos = search(self._maxes, item)
+        if pos == len(self._maxes):
+            return self._len
+        offset = sum(len(block) for block in self._blocks[:pos])
+        return offset + search(self._blocks[pos], item)
+
+    # Number of items between lo and hi (inclusive), None means unbounded.
+    def count(self, lo=None, hi=None):
+        start = 0 if lo is None else self._position(lo)
+        end = self._len if hi is None else self._position(hi, right=True)
+        return max(0, end - start)
+
+    # Iterate items between lo and hi (inclusive) in sorted order, None means unbounded.
+    def irange(self, lo=None, hi=None):
+        if not self._maxes:
+            return
+        if lo is None:
+            pos, idx = 0, 0
+        else:
+            pos = bisect_left(self._maxes, lo)
+            if pos == len(self._maxes):
+                return
+            idx = bisect_left(self._blocks[pos], lo)
+        for block in self._blocks[pos:]:
+            if hi is None or not hi < block[-1]:
+                # The whole block is in range, no per item comparison.
+                yield from block[idx:] if idx else block
+            else:
+                for item in block[idx:] if idx else block:
+                    if hi < item:
+                        return
+                    yield item
+                return
+            idx = 0
+
+    # Iterate items between lo and hi (inclusive) from largest to smallest, None means unbounded.
+    def irange_reversed(self, lo=None, hi=None):
+        if not self._maxes:
+            return
+        if hi is None:
+            pos = len(self._blocks) - 1
+            idx = len(self._blocks[pos])
+        else:
+            pos = bisect_right(self._maxes, hi)
+            if pos == len(self._maxes):
+                pos -= 1
+            idx = bisect_right(self._blocks[pos], hi)
+        while pos >= 0:
+            block = self._blocks[pos]
+            for i in range(idx - 1, -1, -1):
+                item = block[i]
+                if lo is not None and item < lo:
+                    return
+                yield item
+            pos -= 1
+            if pos >= 0:
+                idx = len(self._blocks[pos])
+
+# Inverted n-gram index over lowercased names, maps each n-gram to the ids of products whose name contains it.
+class NgramIndex:
+    def __init__(self, n=3):
+        self.n = n
+        self.postings = defaultdict(set)
+        # Lowercased name per product id, used to verify candidates and to unindex on removal.
+        self.names = {}
+        # Names shorter than n have no n-grams and are checked directly.
+        self.short_names = set()
+        # Ids added by add or update whose n-grams are not posted yet, see post_pending.
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    # Distinct n-grams of an already lowercased text.
+    def _grams(self, text):
+        n = self.n
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    # Store the lowercased name, its n-grams are posted by the next estimate or search as for update.
+    def add(self, product_id, name):
+        text = name.lower()
+        self.names[product_id] = text
+        if len(text) < self.n:
+            self.short_names.add(product_id)
+        else:
+            self.pending.add(product_id)
+
+    # Add many (product_id, name) pairs. Only the lowercased names are stored here, their n-grams are posted
+    # by the next estimate or search, so loads don't pay for name searches that may never come.
+    def update(self, pairs):
+        n = self.n
+        lowered = [(product_id, name.lower()) for product_id, name in pairs]
+        self.names.update(lowered)
+        self.short_names.update([product_id for product_id, text in lowered if len(text) < n])
+        self.pending.update([product_id for product_id, text in lowered if len(text) >= n])
+
+    # Post the n-grams of the names added by add or update. Readers may get here together, the lock lets one post.
+    # Names are grouped by length so each n-gram position is sliced out of the whole group in one map.
+    def post_pending(self):
+        with self.lock:
+            n = self.n
+            names = self.names
+            postings = self.postings
+            ids_by_length = defaultdict(list)
+            for product_id in self.pending:
+                ids_by_length[len(names[product_id])].append(product_id)
+            for length, product_ids in ids_by_length.items():
+                texts = [names[product_id] for product_id in product_ids]
+                for start in range(length - n + 1):
+                    for gram, product_id in zip(map(itemgetter(slice(start, start + n)), texts), product_ids):
+                        postings[gram].add(product_id)
+            self.pending = set()
+
+    # Rebuild the name table and posting sets at their live size. Returns the bytes freed.
+    def compact(self):
+        before = _sizeof((self.names, self.short_names, self.pending, self.postings)) + _sizeof(self.postings.values())
+        self.names = dict(self.names)
+        self.short_names = set(self.short_names)
+        self.pending = set(self.pending)
+        self.postings = defaultdict(set, ((gram, set(ids)) for gram, ids in self.postings.items()))
+        return before - (_sizeof((self.names, self.short_names, self.pending, self.postings)) +
+                         _sizeof(self.postings.values()))
+
+    def remove(self, product_id):
+        text = self.names.pop(product_id, None)
+        if text is None:
+            return False
+        self.short_names.discard(product_id)
+        if product_id in self.pending:
+            # Never posted.
+            self.pending.discard(product_id)
+            return True
+        for gram in self._grams(text):
+            ids = self.postings[gram]
+            ids.discard(product_id)
+            # Removal of gram key when no names use it.
+            if not ids:
+                del self.postings[gram]
+        return True
+
+    # Upper bound on the number of matches, cheap enough for the query planner.
+    def estimate(self, keyword):
+        if self.pending:
+            self.post_pending()
+        text = keyword.lower()
+        if len(text) < self.n:
+            return len(self.names)
+        return min((len(self.postings.get(gram, ())) for gram in self._grams(text)), default=0)
+
+    # Ids of products whose name contains keyword (or starts with it when prefix is True), not case sensitive.
+    def search(self, keyword, prefix=False):
+        if self.pending:
+            self.post_pending()
+        text = keyword.lower()
+        names = self.names
+        if len(text) >= self.n:
+            # Intersect posting sets starting from the smallest one.
+            postings = sorted((self.postings.get(gram, set()) for gram in self._grams(text)), key=len)
+            candidates = postings[0]
+            for ids in postings[1:]:
+                if not candidates:
+                    break
+                candidates = candidates & ids
+        elif text:
+            # Short keywords: every name of length >= n holding the keyword has an n-gram holding it.
+            candidates = set(self.short_names)
+            for gram, ids in self.postings.items():
+                if text in gram:
+                    candidates |= ids
+        else:
+            candidates = names.keys()
+        if prefix:
+            return {pid for pid in candidates if names[pid].startswith(text)}
+        return {pid for pid in candidates if text in names[pid]}
+
+# Running totals for one category: SKU count, units and stock value (price x quantity). The min/max price is read
+# from the price index, see Inventory._category_price_bounds. Products are added and removed as a whole, a change
+# is a remove of the old values then an add.
+class CategoryAggregate:
+    def __init__(self):
+        self.count = 0
+        self.units = 0
+        self.stock_value = 0.0
+
+    # whole=False only adds units and stock value, for price or quantity changes within the category.
+    def add(self, price, quantity, whole=True):
+        self.units += quantity
+        self.stock_value += price * quantity
+        if whole:
+            self.count += 1
+
+    # Add a list of (price, quantity) rows.
+    def update(self, rows):
+        self.count += len(rows)
+        self.units += sum(quantity for _, quantity in rows)
+        self.stock_value += sum(price * quantity for price, quantity in rows)
+
+    def remove(self, price, quantity, whole=True):
+        self.units -= quantity
+        self.stock_value -= price * quantity
+        if whole:
+            self.count -= 1
+
+    def summary(self, lowest, highest):
+        return {'count': self.count, 'units': self.units, 'stock_value': self.stock_value,
+                'min_price': lowest, 'max_price': highest}
+
+# Secondary index declared with Inventory.add_index, mapping the values of one or more fields (a composite key)
+# to the set of product ids holding them. Answers queries giving an exact value for every field.
+# Products missing one of the fields are left out.
+class HashIndex:
+    kind = 'hash'
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.field_set = frozenset(self.fields)
+        self.buckets = defaultdict(set)
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.buckets.values())
+
+    # Helper giving the key of a product, None when a field is missing.
+    def _key(self, data):
+        try:
+            return tuple(data[field] for field in self.fields)
+        except KeyError:
+            return None
+
+    def add(self, product_id, data):
+        key = self._key(data)
+        if key is not None:
+            self.buckets[key].add(product_id)
+
+    # Add many (product_id, data) pairs.
+    def update(self, rows):
+        for product_id, data in rows:
+            self.add(product_id, data)
+
+    # Add the new rows of a bulk upsert, once their products are in products.
+    def update_rows(self, rows, products):
+        self.update((row[0], products[row[0]].data) for row in rows)
+
+    def remove(self, product_id, data):
+        key = self._key(data)
+        ids = self.buckets.get(key) if key is not None else None
+        if ids is not None:
+            ids.discard(product_id)
+            if not ids:
+                del self.buckets[key]
+
+    def clear(self):
+        self.buckets.clear()
+
+    # Rebuild the bucket table and sets at their live size. Returns the bytes freed.
+    def compact(self):
+        before = _sizeof((self.buckets,)) + _sizeof(self.buckets.values())
+        self.buckets = defaultdict(set, ((key, set(ids)) for key, ids in self.buckets.items()))
+        return before - (_sizeof((self.buckets,)) + _sizeof(self.buckets.values()))
+
+    # How this index would answer a query with the given exact values and (low, high) ranges.
+    # Returns (estimated rows, fetch ids callable, fields fully answered) or None if it can't help.
+    def match(self, equals, ranges):
+        if not self.field_set.issubset(equals):
+            return None
+        ids = self.buckets.get(tuple(equals[field] for field in self.fields), ())
+        return len(ids), lambda: ids, self.field_set
+
+# Built-in hash index of the product ids in each category, the inventory's products_by_category. Buckets are keyed
+# on the category itself. writable(category) gives the id set the index may change, the inventory passes a helper
+# that first copies sets a snapshot may share.
+class CategoryIndex(HashIndex):
+    def __init__(self, writable=None):
+        super().__init__(('category',))
+        self.writable = writable or self._bucket
+
+    # Helper giving the id set of a category, created on first use.
+    def _bucket(self, category):
+        return self.buckets[category]
+
+    def add(self, product_id, data):
+        self.writable(data['category']).add(product_id)
+
+    # Add the new rows of a bulk upsert, one set update per category.
+    def update_rows(self, rows, products):
+        ids_by_category = defaultdict(list)
+        for row in rows:
+            ids_by_category[row[4]].append(row[0])
+        for category, product_ids in ids_by_category.items():
+            self.writable(category).update(product_ids)
+
+    # Remove a product, dropping its category once empty.
+    def remove(self, product_id, data):
+        category = data['category']
+        ids = self.writable(category)
+        ids.discard(product_id)
+        if not ids:
+            del self.buckets[category]
+
+    def match(self, equals, ranges):
+        if 'category' not in equals:
+            return None
+        ids = self.buckets.get(equals['category'], ())
+        return len(ids), lambda: ids, self.field_set
+
+# Sorted secondary index declared with Inventory.add_index, keeps (value, ..., product_id) tuples in order.
+# Answers queries giving exact values for a leading run of the fields and optionally a range or exact value
+# for the next one, like (category, price) for "Chairs between 100 and 300". Values of a field must be comparable.
+class SortedIndex:
+    kind = 'sorted'
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.field_set = frozenset(self.fields)
+        self.entries = SortedKeyList()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Helper giving the entry of a product, None when a field is missing.
+    def _entry(self, product_id, data):
+        try:
+            return tuple(data[field] for field in self.fields) + (product_id,)
+        except KeyError:
+            return None
+
+    def add(self, product_id, data):
+        entry = self._entry(product_id, data)
+        if entry is not None:
+            self.entries.add(entry)
+
+    # Add many (product_id, data) pairs, merged in one batch.
+    def update(self, rows):
+        entries = (self._entry(product_id, data) for product_id, data in rows)
+        self.entries.update(entry for entry in entries if entry is not None)
+
+    # Add the new rows of a bulk upsert, once their products are in products.
+    def update_rows(self, rows, products):
+        self.update((row[0], products[row[0]].data) for row in rows)
+
+    def remove(self, product_id, data):
+        entry = self._entry(product_id, data)
+        if entry is not None:
+            self.entries.remove(entry)
+
+    def clear(self):
+        self.entries = SortedKeyList()
+
+    def compact(self):
+        return self.entries.compact()
+
+    # See HashIndex.match. Bounds are tuple prefixes, a shorter tuple sorts before every tuple it starts.
+    def match(self, equals, ranges):
+        prefix = []
+        for field in self.fields:
+            if field not in equals:
+                break
+            prefix.append(equals[field])
+        covered = set(self.fields[:len(prefix)])
+        low, high = tuple(prefix), tuple(prefix) + (_MAX_KEY,)
+        if len(prefix) < len(self.fields) and self.fields[len(prefix)] in ranges:
+            field = self.fields[len(prefix)]
+            range_low, range_high = ranges[field]
+            if range_low is not None:
+                low = low + (range_low,)
+            if range_high is not None:
+                high = tuple(prefix) + (range_high, _MAX_KEY)
+            covered.add(field)
+        if not covered:
+            return None
+        entries = self.entries
+        return entries.count(low, high), lambda: map(itemgetter(-1), entries.irange(low, high)), covered
+
+# Built-in sorted index over one field (price, quantity), holds (value, product_id) pairs in value order. The name
+# order uses it too, with lowercased names passed through the *_value methods.
+class RangeIndex(SortedIndex):
+    def __init__(self, field):
+        super().__init__((field,))
+        self.field = field
+        # Position of the field in bulk rows, None when it is not a product field.
+        self.position = PRODUCT_FIELDS.index(field) if field in PRODUCT_FIELDS else None
+
+    def _entry(self, product_id, data):
+        try:
+            return data[self.field], product_id
+        except KeyError:
+            return None
+
+    # Single field add and remove, without the entry helper call on the per-product write path.
+    def add(self, product_id, data):
+        try:
+            value = data[self.field]
+        except KeyError:
+            return
+        self.entries.add((value, product_id))
+
+    def remove(self, product_id, data):
+        try:
+            value = data[self.field]
+        except KeyError:
+            return
+        self.entries.remove((value, product_id))
+
+    def add_value(self, value, product_id):
+        self.entries.add((value, product_id))
+
+    def remove_value(self, value, product_id):
+        return self.entries.remove((value, product_id))
+
+    # Add many (value, product_id) pairs at once. A large batch is sorted on the id and then, stably, on the value:
+    # the same order as comparing the pairs, but each pass compares bare values, a few times faster than tuples.
+    def update_values(self, pairs):
+        pairs = list(pairs)
+        if len(pairs) * 4 >= len(self.entries):
+            pairs.sort(key=itemgetter(1))
+            pairs.sort(key=itemgetter(0))
+        self.entries.update(pairs)
+
+    # Add the new rows of a bulk upsert, taking the values straight from the rows.
+    def update_rows(self, rows, products):
+        if self.position is None:
+            super().update_rows(rows, products)
+        else:
+            position = self.position
+            self.update_values([(row[position], row[0]) for row in rows])
+
+    # Convert value bounds into entry bounds. (value,) sorts before any (value, id) and (value, _MAX_KEY) after.
+    @staticmethod
+    def _bounds(low, high):
+        lo = None if low is None else (low,)
+        hi = None if high is None else (high, _MAX_KEY)
+        return lo, hi
+
+    # Number of products with low <= value <= high, O(log n) plus one pass over block sizes.
+    def count(self, low=None, high=None):
+        return self.entries.count(*self._bounds(low, high))
+
+    # Product ids with low <= value <= high, in value order.
+    def range_ids(self, low=None, high=None):
+        return map(itemgetter(1), self.entries.irange(*self._bounds(low, high)))
+
+# LRU cache of filter results keyed on the normalized criteria. Each entry remembers the version of the
+# category it read (or of the whole catalog when no category was given) and is dropped once that version moves.
+class QueryCache:
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Lookups reorder the LRU, so concurrent readers share this lock.
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Cached ids for key if the entry was stored at the given version, otherwise None.
+    def get(self, key, version):
+        with self.lock:
+            return self._get(key, version)
+
+    def _get(self, key, version):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != version:
+            # Stale entry, written before the last change to the data it read.
+            self._drop(key)
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, version, product_ids):
+        product_ids = tuple(product_ids)
+        # The id tuple is the part that grows, the ids themselves are shared with the inventory.
+        size = sys.getsizeof(product_ids)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self.lock:
+            self._put(key, version, product_ids, size)
+
+    def _put(self, key, version, product_ids, size):
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = (version, product_ids, size)
+        self.size_bytes += size
+        while len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        self.size_bytes -= self.entries.pop(key)[2]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries), 'bytes': self.size_bytes, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+# Raised when a change feed cursor points at events already dropped from the ring buffer.
+# The consumer missed changes and has to resync from list_products() before opening a new cursor.
+class CursorExpired(LookupError):
+    pass
+
+# Sequenced stream of inventory changes kept in a bounded ring buffer, registered as an Inventory listener.
+# Every event is (sequence, op, product_id, fields) with ops as in Inventory.add_listener, sequences start at 1
+# and increase by one per event so a consumer only has to remember the last sequence it processed.
+class ChangeFeed:
+    def __init__(self, capacity=65536):
+        self.events = deque(maxlen=capacity)
+        self.sequence = 0
+        # Readers may poll from other threads while the inventory writes.
+        self.changed = threading.Condition()
+
+    def __len__(self):
+        return len(self.events)
+
+    # Listener entry point, see Inventory.add_listener.
+    def __call__(self, op, product_id, fields):
+        with self.changed:
+            self.sequence += 1
+            self.events.append((self.sequence, op, product_id, fields))
+            self.changed.notify_all()
+
+    # Oldest sequence still retained (sequence + 1 while the buffer is empty).
+    def first_sequence(self):
+        return self.events[0][0] if self.events else self.sequence + 1
+
+    # Events after the given sequence, oldest first, at most limit of them.
+    def read(self, after=0, limit=None):
+        with self.changed:
+            first = self.first_sequence()
+            if after < first - 1:
+                raise CursorExpired(f"Events {after + 1} to {first - 1} were dropped from the change feed.")
+            start = after - first + 1
+            return list(islice(self.events, start, None if limit is None else start + limit))
+
+    # Block until an event after the given sequence exists or timeout runs out. Returns True if one exists.
+    def wait(self, after, timeout=None):
+        with self.changed:
+            return self.changed.wait_for(lambda: self.sequence > after, timeout)
+
+    # Cursor starting after the given sequence, or at the current end of the feed (only new changes) when None.
+    def cursor(self, after=None):
+        with self.changed:
+            return ChangeCursor(self, self.sequence if after is None else after)
+
+# Read position of one consumer in a ChangeFeed. Persist position to resume after a restart with feed.cursor(position).
+class ChangeCursor:
+    def __init__(self, feed, position):
+        self.feed = feed
+        self.position = position
+
+    # Next events for this consumer, moving the cursor past them.
+    def poll(self, limit=None, timeout=None):
+        if timeout is not None:
+            self.feed.wait(self.position, timeout)
+        events = self.feed.read(self.position, limit)
+        if events:
+            self.position = events[-1][0]
+        return events
+
+    # Number of events this consumer has not read yet.
+    def lag(self):
+        return self.feed.sequence - self.position
+
+# Stock held for one order by Inventory.reserve until it is committed or released.
+class Reservation:
+    def __init__(self, reservation_id, lines, shortages):
+        self.reservation_id = reservation_id
+        # Reserved quantity per product id.
+        self.lines = lines
+        # Requested quantity that could not be reserved per product id, only set for partial fills.
+        self.shortages = shortages
+        self.status = 'held'
+
+    def __repr__(self):
+        return (f"Reservation ID: {self.reservation_id}, Status: {self.status}, "
+                f"Lines: {self.lines}, Shortages: {self.shortages}")
+
+# Fields feeding the category aggregates, a change to any of them moves the product's totals.
+_AGGREGATE_FIELDS = frozenset(('price', 'quantity', 'category'))
+# Fields that move the product between the per-category counts.
+_RECOUNT_FIELDS = frozenset(('category',))
+# Criteria each built-in query plan answers exactly, see Inventory._plan_candidates.
+_PLAN_COVERS = {'scan': frozenset(), 'keyword': frozenset(('name_keyword',)), 'prefix': frozenset(('name_prefix',)),
+                'vector': frozenset(('category', 'price', 'quantity'))}
+# Indexes every inventory registers, see Inventory.indexes. Their query plans carry the index name alone.
+_BUILTIN_INDEXES = ('category', 'price', 'quantity')
+
 # Define a class for the inventory which manages products for rapid lookup.
 class Inventory:
-    # Initialize the inventory with a dictionary to hold products
-    def __init__(self):
-        self.products = {}
-        # Secondary index to hold products grouped by categories.
-        self.products_by_category =defaultdict(set) #Changing from list to set for more efficient searching.
-
-    # Helper to update category index when product category changes.
-    def _update_product_category(self, product_id, old_category, new_category):
-       # New optimized helper for updating category index when product category changes.
-       if old_category:
-           # Remove from old category set.
-           self.products_by_category[old_category].discard(product_id)
-           # Removal of category key is set is empty.
-           if not self.products_by_category[old_category]:
-               del self.products_by_category[old_category]
-
-       # Add new category set.
-       if new_category:
-           self.products_by_category[new_category].add(product_id) 
-
-    # Add a new product or update an existing product
-    def add_product(self, product_id, name, price, quantity, category):
+    # How many rows a vectorized mask pass handles in the time a Python loop checks one product.
+    vector_speedup = 32
+    # Cost of reading one candidate through an index, against checking one product in a full scan. Id sets are read
+    # in roughly the order products were stored. Range and sorted index walks step through an entry tuple per product
+    # and visit products in value order, losing the memory locality of a scan.
+    set_read_cost = 2
+    walk_read_cost = 5
+
+    # Initialize the inventory with a dictionary to hold products, storage='compact' holds slotted CompactProducts
+    # instead of per-product dictionaries and storage='columnar' keeps them in column arrays.
+    # cache_size > 0 caches up to that many filter results within cache_bytes.
+    # feed_size > 0 records every change in a ChangeFeed retaining that many events.
+    def __init__(self, storage='dict', cache_size=0, cache_bytes=16 * 1024 * 1024, feed_size=0, compact_threshold=None):
+        # Class of the products created for dict and compact storage, columnar storage makes its own.
+        self.product_class = CompactProduct if storage == 'compact' else Product
+        if storage == 'columnar':
+            self.products = ColumnarProductStore()
+        elif storage in ('dict', 'compact'):
+            self.products = {}
+        else:
+            raise ValueError(f"Unknown storage '{storage}', expected 'dict', 'compact' or 'columnar'.")
+        # Secondary indexes by name: the built-in category index (products grouped by category, see
+        # products_by_category) and price and quantity range indexes, then those declared with add_index.
+        self.indexes = {'category': CategoryIndex(self._writable_category), 'price': RangeIndex('price'),
+                        'quantity': RangeIndex('quantity')}
+        self._reset_indexes()
+        # Copy-on-write state for snapshots. While snapshots are open the product table and category sets they
+        # share are copied before the first write, and products are cloned before their first change.
+        self._open_snapshots = 0
+        # Snapshots can be closed from any thread (or by the garbage collector), the count has its own lock.
+        self._snapshot_lock = threading.Lock()
+        self._shared = False
+        self._fresh_products = set()
+        self._fresh_categories = set()
+        # Change counters per category and for the whole catalog, used to invalidate cached filter results.
+        self.category_versions = defaultdict(int)
+        self.catalog_version = 0
+        self.query_cache = QueryCache(cache_size, cache_bytes) if cache_size else None
+        # Stock held by open reservations per product id, and the open reservations themselves.
+        self.reserved = {}
+        self.reservations = {}
+        self._reservation_ids = count(1)
+        # Reorder point per product id, the ids currently below theirs, and callbacks told when a product
+        # crosses its reorder point. Reorder points are kept by product id and outlive removals and reloads.
+        self.reorder_points = {}
+        self.low_stock = set()
+        self.stock_alerts = []
+        # Callback(plan, scanned, returned) told about every filter, see DynamicInventoryManagement_Metrics. scanned
+        # is the plan's estimate of the rows it reads. Left as None the filters skip it, so the hook costs one
+        # attribute check.
+        self.plan_observer = None
+        # Callbacks told about every change, see add_listener.
+        self.listeners = []
+        self.change_feed = None
+        if feed_size:
+            self.change_feed = ChangeFeed(feed_size)
+            self.listeners.append(self.change_feed)
+        # Most products held since the last compaction. With a compact_threshold, removals compact the containers
+        # once fewer than that fraction of the peak remain, see compact.
+        self.peak_products = 0
+        self.compact_threshold = compact_threshold
+
+    # Product ids per category, the buckets of the built-in category index.
+    @property
+    def products_by_category(self):
+        return self.indexes['category'].buckets
+
+    @products_by_category.setter
+    def products_by_category(self, buckets):
+        self.indexes['category'].buckets = buckets
+
+    # Built-in range indexes, used directly for price and quantity ordering and the category price bounds.
+    @property
+    def price_index(self):
+        return self.indexes['price']
+
+    @property
+    def quantity_index(self):
+        return self.indexes['quantity']
+
+    # Register callback(op, product_id, fields) called after each change. op is 'add' (fields holds every field),
+    # 'update' (fields holds the changed fields), 'remove' or 'clear' (fields is None, product_id too for 'clear').
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+    # Helper to tell the listeners about a change.
+    def _notify(self, op, product_id, fields):
+        for callback in self.listeners:
+            callback(op, product_id, fields)
+
+    # Register callback(product_id, quantity, reorder_point, low) called when a product drops below its reorder point
+    # (low is True) or is restocked to it or above (low is False).
+    def add_stock_alert(self, callback):
+        self.stock_alerts.append(callback)
+
+    def remove_stock_alert(self, callback):
+        self.stock_alerts.remove(callback)
+
+    # Helper to move a product in or out of the low stock set after its quantity or reorder point changed.
+    def _check_stock(self, product_id, quantity):
+        reorder_point = self.reorder_points.get(product_id)
+        low = reorder_point is not None and quantity < reorder_point
+        if low == (product_id in self.low_stock):
+            return
+        if low:
+            self.low_stock.add(product_id)
+        else:
+            self.low_stock.discard(product_id)
+        for callback in self.stock_alerts:
+            callback(product_id, quantity, reorder_point, low)
+
+    # Set the quantity below which a product needs replenishing, None clears it.
+    def set_reorder_point(self, product_id, reorder_point):
+        if reorder_point is None:
+            self.reorder_points.pop(product_id, None)
+        else:
+            self.reorder_points[product_id] = reorder_point
+        product = self.products.get(product_id)
+        if product is not None:
+            self._check_stock(product_id, product.data['quantity'])
+
+    # Products below their reorder point in product id order, read from the low stock set instead of scanning.
+    def low_stock_products(self):
+        products = self.products
+        return [products[product_id] for product_id in sorted(self.low_stock)]
+
+    # Point in time, read-only view of the inventory. Writes keep going at full speed, the view never sees them.
+    # Close it (or use it as a context manager) when done so writers stop copying on its behalf.
+    def snapshot(self):
+        if isinstance(self.products, ColumnarProductStore):
+            # Column arrays are copied up front, which is a handful of memory copies.
+            return InventorySnapshot(self, self.products.copy(), None)
+        self._shared = True
+        with self._snapshot_lock:
+            self._open_snapshots += 1
+        return InventorySnapshot(self, self.products, self.products_by_category)
+
+    # Helper called by InventorySnapshot.close.
+    def _release_snapshot(self):
+        with self._snapshot_lock:
+            self._open_snapshots -= 1
+
+    # Helper to give the writer its own product table and category dictionary before the first write after a
+    # snapshot. Must run before any change to self.products or self.products_by_category.
+    def _writable_table(self):
+        if not self._shared:
+            return
+        self._shared = False
+        self._fresh_products = set()
+        self._fresh_categories = set()
+        if self._open_snapshots:
+            self.products = dict(self.products)
+            self.products_by_category = defaultdict(set, self.products_by_category)
+
+    # Helper returning a product the writer may change in place, cloned first if a snapshot may still hold it.
+    def _writable_product(self, product):
+        if not self._open_snapshots or product.product_id in self._fresh_products:
+            return product
+        clone = product.copy()
+        self.products[product.product_id] = clone
+        self._fresh_products.add(product.product_id)
+        return clone
+
+    # Helper returning the id set of a category the writer may change, copied first if a snapshot may share it.
+    def _writable_category(self, category):
+        if not self._open_snapshots or category in self._fresh_categories:
+            return self.products_by_category[category]
+        ids = set(self.products_by_category.get(category, ()))
+        self.products_by_category[category] = ids
+        self._fresh_categories.add(category)
+        return ids
+
+    # Helper to record a change to a product in category.
+    def _bump_version(self, category):
+        self.category_versions[category] += 1
+        self.catalog_version += 1
+
+    # Helper to create empty indexes.
+    def _reset_indexes(self):
+        # Trigram index over lowercased product names for keyword search.
+        self.name_index = NgramIndex()
+        # Sorted product ids and (lowercased name, product id) pairs so listings never sort the whole catalog.
+        self.id_order = SortedKeyList()
+        self.name_order = RangeIndex('name')
+        # Running count, units and stock value per category, see category_summary.
+        self.category_aggregates = {}
+        # Built-in and declared indexes are kept, only emptied.
+        for secondary in self.indexes.values():
+            secondary.clear()
+
+    # Declare a secondary index named name over one or more product fields, including extra attributes such as
+    # supplier or location. kind='hash' answers exact values for every field, kind='sorted' answers exact values
+    # for leading fields plus a range on the next, e.g. ('category', 'price'). Kept up to date on every change
+    # and picked by the filter planner when it is the most selective choice.
+    def add_index(self, name, fields, kind='hash'):
+        if name in self.indexes:
+            raise ValueError(f"Index '{name}' already exists.")
+        if isinstance(fields, str):
+            fields = (fields,)
+        if kind == 'hash':
+            declared = HashIndex(fields)
+        elif kind == 'sorted':
+            declared = SortedIndex(fields)
+        else:
+            raise ValueError(f"Unknown index kind '{kind}', expected 'hash' or 'sorted'.")
+        declared.update((product_id, product.data) for product_id, product in self.products.items())
+        self.indexes[name] = declared
+        return declared
+
+    # Drop a declared index, the built-in category, price and quantity indexes stay.
+    def drop_index(self, name):
+        if name in _BUILTIN_INDEXES:
+            raise ValueError(f"Index '{name}' is built in and cannot be dropped.")
+        return self.indexes.pop(name)
+
+    # Helper to add a product to the category aggregates, whole=False when the category is unchanged.
+    def _aggregate_product(self, data, whole=True):
+        aggregate = self.category_aggregates.get(data['category'])
+        if aggregate is None:
+            aggregate = self.category_aggregates[data['category']] = CategoryAggregate()
+        aggregate.add(data['price'], data['quantity'], whole)
+
+    # Helper to take a product out of the category aggregates, empty categories are dropped.
+    def _unaggregate_product(self, data, whole=True):
+        aggregate = self.category_aggregates[data['category']]
+        aggregate.remove(data['price'], data['quantity'], whole)
+        if not aggregate.count:
+            del self.category_aggregates[data['category']]
+
+    # Helper to add a product to the registered, name and order indexes, fields limits it to the indexes of those
+    # fields.
+    def _index_product(self, product, fields=None):
+        data = product.data
+        self._bump_version(data['category'])
+        if fields is None or not _AGGREGATE_FIELDS.isdisjoint(fields):
+            self._aggregate_product(data, fields is None or not _RECOUNT_FIELDS.isdisjoint(fields))
+        for secondary in self.indexes.values():
+            if fields is None or not secondary.field_set.isdisjoint(fields):
+                secondary.add(product.product_id, data)
+        if fields is None or 'name' in fields:
+            self.name_index.add(product.product_id, data['name'])
+            # Same lowercased string as the name index holds, stored once.
+            self.name_order.add_value(self.name_index.names[product.product_id], product.product_id)
+        if fields is None:
+            self.id_order.add(product.product_id)
+        if self.reorder_points and (fields is None or 'quantity' in fields):
+            self._check_stock(product.product_id, data['quantity'])
+
+    # Helper to remove a product from the registered, name and order indexes, must run before the product fields
+    # change and after _writable_table.
+    def _unindex_product(self, product, fields=None):
+        data = product.data
+        self._bump_version(data['category'])
+        if fields is None or not _AGGREGATE_FIELDS.isdisjoint(fields):
+            self._unaggregate_product(data, fields is None or not _RECOUNT_FIELDS.isdisjoint(fields))
+        for secondary in self.indexes.values():
+            if fields is None or not secondary.field_set.isdisjoint(fields):
+                secondary.remove(product.product_id, data)
+        if fields is None or 'name' in fields:
+            self.name_index.remove(product.product_id)
+            self.name_order.remove_value(data['name'].lower(), product.product_id)
+        if fields is None:
+            self.id_order.remove(product.product_id)
+            # Removed products leave the low stock set without an alert.
+            self.low_stock.discard(product.product_id)
+
+    # Helper to change product fields while keeping every index in sync, only changed fields are reindexed.
+    def _modify_product(self, product, changes):
+        # Checked before any index is touched, a rejected value leaves the product as it was.
+        self._check_values(changes, isinstance(self.products, ColumnarProductStore))
+        data = product.data
+        changed = [field for field, value in changes.items() if data.get(field) != value]
+        if not changed:
+            return
+        if self._open_snapshots or self._shared:
+            self._writable_table()
+            product = self._writable_product(product)
+            data = product.data
+        self._unindex_product(product, changed)
+        data.update(changes)
+        self._index_product(product, changed)
+        if self.listeners:
+            self._notify('update', product.product_id, {field: data[field] for field in changed})
+
+    # Add a new product or update an existing product. Keyword arguments set extra attributes such as
+    # supplier='Acme', an update leaves attributes it does not name unchanged.
+    def add_product(self, product_id, name, price, quantity, category, **attributes):
        # New optimized add product function.
        # Check if new product exists.
        if product_id in self.products:
-           old_category = self.products[product_id].data['category']
            new_product = self.products[product_id]
-           new_product.data.update({'name': name, 'price': price, 'quantity': quantity, 'category': category})
-           self._update_product_category(product_id, old_category, category)
+           self._modify_product(new_product, {'name': name, 'price': price, 'quantity': quantity, 'category': category,
+                                              **attributes})
        else:
-           # Adding new product.
-           new_product = Product(product_id, name, price, quantity, category)
+           # Adding new product, checked first so a rejected value leaves the inventory as it was.
+           self._check_values({'name': name, 'price': price, 'quantity': quantity, 'category': category},
+                              isinstance(self.products, ColumnarProductStore))
+           if self._shared:
+               self._writable_table()
+           new_product = self.product_class(product_id, name, price, quantity, category, **attributes)
            self.products[product_id] = new_product
-           # Add new product id to category set
-           self.products_by_category[category].add(product_id)
+           if self._open_snapshots:
+               self._fresh_products.add(product_id)
+           if len(self.products) > self.peak_products:
+               self.peak_products = len(self.products)
+           # Add new product id to the category set and every other index.
+           self._index_product(new_product)
+           if self.listeners:
+               self._notify('add', product_id, {'name': name, 'price': price, 'quantity': quantity, 'category': category,
+                                                **attributes})
+
+    # Update the quantity of an existing product, quantities never go below 0.
+    def update_quantity(self, product_id, quantity):
+        product = self.products.get(product_id)
+        if product is None:
+            return False
+        new_quantity = max(0, product.data['quantity'] + quantity)
+        self._modify_product(product, {'quantity': new_quantity})
+        return True
+
+    # Update the price of an existing product.
+    def update_price(self, product_id, price):
+        product = self.products.get(product_id)
+        if product is None:
+            return False
+        self._modify_product(product, {'price': price})
+        return True
+
+    # Quantity of a product not held by open reservations, 0 for unknown products.
+    def available_quantity(self, product_id):
+        product = self.products.get(product_id)
+        if product is None:
+            return 0
+        return max(0, product.data['quantity'] - self.reserved.get(product_id, 0))
+
+    # Hold stock for every (product_id, quantity) line of an order in one step. Items can be a dictionary or pairs.
+    # If any line is short the whole order is rejected and None returned, unless partial is True in which case
+    # each line is filled as far as stock allows and the rest is recorded in the reservation shortages.
+    def reserve(self, items, partial=False):
+        requested = defaultdict(int)
+        for product_id, quantity in (items.items() if isinstance(items, dict) else items):
+            if quantity <= 0:
+                raise ValueError(f"Reserved quantity for Product ID {product_id} must be positive, got {quantity}.")
+            requested[product_id] += quantity
+
+        lines = {}
+        shortages = {}
+        for product_id, quantity in requested.items():
+            filled = min(quantity, self.available_quantity(product_id))
+            if filled < quantity:
+                if not partial:
+                    return None
+                shortages[product_id] = quantity - filled
+            if filled:
+                lines[product_id] = filled
+        if not lines:
+            return None
+
+        reserved = self.reserved
+        for product_id, quantity in lines.items():
+            reserved[product_id] = reserved.get(product_id, 0) + quantity
+        reservation = Reservation(next(self._reservation_ids), lines, shortages)
+        self.reservations[reservation.reservation_id] = reservation
+        return reservation
+
+    # Helper to hand reserved stock back to the available pool.
+    def _unreserve(self, reservation):
+        reserved = self.reserved
+        for product_id, quantity in reservation.lines.items():
+            remaining = reserved.get(product_id, 0) - quantity
+            if remaining > 0:
+                reserved[product_id] = remaining
+            else:
+                reserved.pop(product_id, None)
+        del self.reservations[reservation.reservation_id]
+
+    # Helper dropping the holds on a removed product, so a product later added under the same id starts
+    # unreserved. Orders left without lines are released.
+    def _drop_reservations(self, product_id):
+        del self.reserved[product_id]
+        for reservation_id, reservation in list(self.reservations.items()):
+            if reservation.lines.pop(product_id, None) is not None and not reservation.lines:
+                reservation.status = 'released'
+                del self.reservations[reservation_id]
+
+    # Take the reserved stock out of the inventory, every line of the order at once.
+    def commit(self, reservation_id):
+        reservation = self.reservations.get(reservation_id)
+        if reservation is None:
+            return False
+        self._unreserve(reservation)
+        for product_id, quantity in reservation.lines.items():
+            product = self.products.get(product_id)
+            # Products removed while the reservation was open have nothing left to take.
+            if product is not None:
+                self._modify_product(product, {'quantity': max(0, product.data['quantity'] - quantity)})
+        reservation.status = 'committed'
+        return True
+
+    # Cancel a reservation, its stock becomes available again.
+    def release(self, reservation_id):
+        reservation = self.reservations.get(reservation_id)
+        if reservation is None:
+            return False
+        self._unreserve(reservation)
+        reservation.status = 'released'
+        return True
 
     # Get a product by its ID
     def get_product(self, product_id):
         return self.products.get(product_id, None)
 
+    # Get many products at once, as a product_id -> Product (or None) dictionary.
+    def get_products(self, product_ids):
+        products = self.products
+        return {product_id: products.get(product_id) for product_id in product_ids}
+
+    # Normalize bulk input to (product_id, name, price, quantity, category) tuples, with an extra attributes
+    # dictionary as sixth item for rows that have any. Accepts rows as tuples or dictionaries (keys beyond the
+    # product fields are extra attributes), or columns as a dictionary of equal length sequences.
+    @staticmethod
+    def _bulk_rows(data):
+        if isinstance(data, dict):
+            rows = zip(*(data[field] for field in PRODUCT_FIELDS))
+            extra = [field for field in data if field not in PRODUCT_FIELDS]
+            if not extra:
+                return rows
+            return (row + (dict(zip(extra, values)),) for row, values in zip(rows, zip(*(data[field] for field in extra))))
+        return (Inventory._dict_row(row) if isinstance(row, dict) else tuple(row) for row in data)
+
+    # Helper turning one dictionary row into a bulk row tuple.
+    @staticmethod
+    def _dict_row(row):
+        values = tuple(row[field] for field in PRODUCT_FIELDS)
+        attributes = extra_attributes(row)
+        return values + (attributes,) if attributes else values
+
+    # Helper checking product fields before anything is written: a string name, a price and quantity the range
+    # indexes can sort (columnar storage also needs them to fit its columns) and a hashable category. Fields
+    # missing from values are not checked.
+    @staticmethod
+    def _check_values(values, columnar):
+        if 'name' in values and not isinstance(values['name'], str):
+            raise ValueError(f"Product names must be strings, got {values['name']!r}.")
+        price, quantity = values.get('price', 0.0), values.get('quantity', 0)
+        if columnar:
+            ColumnarProductStore.check_values(price, quantity)
+        elif not hasattr(price, '__float__') or not hasattr(quantity, '__float__'):
+            raise ValueError(f"Prices and quantities must be numeric, got {price!r} and {quantity!r}.")
+        if 'category' in values:
+            hash(values['category'])
+
+    # Helper checking one bulk row before anything is written: all five fields, then the values as above.
+    @staticmethod
+    def _check_bulk_row(row, columnar):
+        if len(row) < len(PRODUCT_FIELDS):
+            raise ValueError(f"Bulk row {row!r} needs product_id, name, price, quantity and category.")
+        Inventory._check_values(dict(zip(PRODUCT_FIELDS, row)), columnar)
+
+    # Helper checking all bulk rows at once. Well-formed batches pass as whole columns converted in C (the arrays
+    # reject what the row checks reject), any failure reruns the row checks so the error names the bad row.
+    @staticmethod
+    def _check_bulk_rows(rows, columnar):
+        try:
+            if min(map(len, rows), default=len(PRODUCT_FIELDS)) >= len(PRODUCT_FIELDS) and \
+                    set(map(type, [row[1] for row in rows])) <= {str}:
+                array('d', [row[2] for row in rows])
+                array('q' if columnar else 'd', [row[3] for row in rows])
+                set([row[4] for row in rows])
+                return
+        except (TypeError, ValueError, OverflowError):
+            pass
+        for row in rows:
+            Inventory._check_bulk_row(row, columnar)
+
+    # Add or update many products in one pass. New products skip the per-row add_product bookkeeping and
+    # are added to the range indexes in one batch. Returns row counts and the load rate.
+    def bulk_upsert(self, data):
+        start_time = time.perf_counter()
+        # Every object made here outlives the load, collections set off by the allocations would find no garbage.
+        with _collector_paused():
+            # Later rows win when an id repeats within the batch.
+            batch = {}
+            row_count = 0
+            for row in self._bulk_rows(data):
+                batch[row[0]] = row
+                row_count += 1
+            columnar = isinstance(self.products, ColumnarProductStore)
+            # Every row is checked first, so a bad row raises before the batch changes anything.
+            self._check_bulk_rows(list(batch.values()), columnar)
+
+            self._writable_table()
+            products = self.products
+            updated = 0
+            new_rows = []
+            for product_id, row in batch.items():
+                if product_id in products:
+                    changes = {'name': row[1], 'price': row[2], 'quantity': row[3], 'category': row[4]}
+                    if len(row) > 5 and row[5]:
+                        changes.update(row[5])
+                    self._modify_product(products[product_id], changes)
+                    updated += 1
+                else:
+                    new_rows.append(row)
+
+            # New rows go in column by column: the table, then each category and index in one batch.
+            if columnar:
+                products.extend(new_rows)
+            else:
+                product_class = self.product_class
+                for row in new_rows:
+                    if len(row) > 5:
+                        products[row[0]] = product_class(*row[:5], **(row[5] or {}))
+                    else:
+                        products[row[0]] = product_class(*row)
+            rows_by_category = defaultdict(list)
+            for row in new_rows:
+                rows_by_category[row[4]].append(row)
+            for category, rows in rows_by_category.items():
+                aggregate = self.category_aggregates.get(category)
+                if aggregate is None:
+                    aggregate = self.category_aggregates[category] = CategoryAggregate()
+                aggregate.update([(row[2], row[3]) for row in rows])
+                self._bump_version(category)
+            for secondary in self.indexes.values():
+                secondary.update_rows(new_rows, products)
+            self.name_index.update([(row[0], row[1]) for row in new_rows])
+            lowered_names = self.name_index.names
+            self.name_order.update_values([(lowered_names[row[0]], row[0]) for row in new_rows])
+            self.id_order.update([row[0] for row in new_rows])
+            if self.reorder_points:
+                for row in new_rows:
+                    self._check_stock(row[0], row[3])
+            if self.listeners:
+                for row in new_rows:
+                    fields = {'name': row[1], 'price': row[2], 'quantity': row[3], 'category': row[4]}
+                    if len(row) > 5 and row[5]:
+                        fields.update(row[5])
+                    self._notify('add', row[0], fields)
+
+        self.peak_products = max(self.peak_products, len(products))
+
+        elapsed = time.perf_counter() - start_time
+        return {'rows': row_count, 'inserted': len(batch) - updated, 'updated': updated,
+                'seconds': elapsed, 'rows_per_sec': row_count / elapsed if elapsed > 0 else float('inf')}
+
+    # Replace the whole inventory with the given rows, rebuilding every index in one pass.
+    # Intended for cold starts and full catalog syncs, see bulk_upsert for the accepted formats.
+    def bulk_load(self, data):
+        if self._open_snapshots and not isinstance(self.products, ColumnarProductStore):
+            # Open snapshots keep the old table, the reload starts from new ones.
+            self.products = {}
+            self.products_by_category = defaultdict(set)
+            self._shared = False
+        else:
+            self.products.clear()
+            self.products_by_category.clear()
+        self.low_stock.clear()
+        self._reset_indexes()
+        # Holds were on the old products.
+        for reservation in self.reservations.values():
+            reservation.status = 'released'
+        self.reservations.clear()
+        self.reserved.clear()
+        if self.query_cache is not None:
+            self.query_cache.clear()
+        if self.listeners:
+            self._notify('clear', None, None)
+        # Clearing released the tables.
+        self.peak_products = 0
+        return self.bulk_upsert(data)
+
     # Remove a product from the inventory
     def remove_product(self, product_id):
        # New optimized removal of products.
         if product_id in self.products:
            product = self.products[product_id]
-           category = product.data['category']
+           if self._shared:
+               self._writable_table()
+           # Removal from the category set and every other index while the product fields are still readable.
+           self._unindex_product(product)
            # Removal of product from dictionary.
            del self.products[product_id]
-           # Removal of product from secondary category index.
-           self.products_by_category[category].discard(product_id)
-           if not self.products_by_category[category]:
-               del self.products_by_category[category]
+           if product_id in self.reserved:
+               self._drop_reservations(product_id)
+           if self.listeners:
+               self._notify('remove', product_id, None)
+           if self.compact_threshold is not None and len(self.products) < self.peak_products * self.compact_threshold:
+               self.compact(self.compact_threshold)
            return True
         return False
+
+    # Rebuild the product table, category sets and indexes at their live size once fewer than threshold of the
+    # peak number of products remain, or always when force is True. Dicts and sets keep the table they grew to
+    # after removals, rebuilding them hands that memory back. Returns None when nothing was done (or snapshots
+    # are open), otherwise the bytes reclaimed from the container tables and the time taken.
+    def compact(self, threshold=0.5, force=False):
+        live = len(self.products)
+        if self._open_snapshots or (not force and live >= self.peak_products * threshold):
+            return None
+        start_time = time.perf_counter()
+        self._writable_table()
+        reclaimed = 0
+        if isinstance(self.products, ColumnarProductStore):
+            reclaimed += self.products.compact()
+        else:
+            before = sys.getsizeof(self.products)
+            self.products = dict(self.products)
+            reclaimed += before - sys.getsizeof(self.products)
+        before = sys.getsizeof(self.low_stock)
+        self.low_stock = set(self.low_stock)
+        reclaimed += before - sys.getsizeof(self.low_stock)
+        # The category index rebuilds the category sets.
+        indexes = [self.name_index, self.id_order, self.name_order]
+        indexes.extend(self.indexes.values())
+        for rebuilt in indexes:
+            reclaimed += rebuilt.compact()
+        peak, self.peak_products = self.peak_products, live
+        return {'products': live, 'peak_products': peak, 'reclaimed_bytes': reclaimed,
+                'seconds': time.perf_counter() - start_time}
     
-    # List all products in the inventory
-    def list_products(self):
-        return sorted(self.products.values())
-    
-    #Filter products based on multiple criteria.
-    def filter_products(self, category=None, min_price=None, max_price =None,
-                        min_quantity=None, max_quantity=None, name_keyword=None):
-        # Subset of products if category selected, otherwise all products.
-       filtered_results = []
-       if category and category in self.products_by_category:
-            candidate_ids = self.products_by_category[category]
-            candidate = [self.products[candid] for candid in candidate_ids]
-       else:
-            candidate = self.products.values()
+    # SKU count, total units, stock value and min/max price of one category (None if it has no products),
+    # or a category -> summary dictionary of every category when category is None. Read from running totals.
+    def category_summary(self, category=None):
+        if category is not None:
+            aggregate = self.category_aggregates.get(category)
+            return None if aggregate is None else aggregate.summary(*self._category_price_bounds(category))
+        return {name: aggregate.summary(*self._category_price_bounds(name))
+                for name, aggregate in self.category_aggregates.items()}
+
+    # Helper giving the lowest and highest price of a category. Walks the price index in from each end until a
+    # product of the category turns up, a category holding a share s of the catalog is met after about 1/s entries.
+    # A walk is cut off after as many entries as the category has products, then its own products are read instead.
+    def _category_price_bounds(self, category):
+        product_ids = self.products_by_category.get(category)
+        if not product_ids:
+            return None, None
+        entries = self.price_index.entries
+        bounds = []
+        for walk in (iter(entries), reversed(entries)):
+            for price, product_id in islice(walk, len(product_ids)):
+                if product_id in product_ids:
+                    bounds.append(price)
+                    break
+            else:
+                products = self.products
+                prices = [products[product_id].data['price'] for product_id in product_ids]
+                return min(prices), max(prices)
+        return bounds[0], bounds[1]
+
+    # Totals over the whole inventory, combined from the category aggregates and the price index.
+    def stats(self):
+        aggregates = self.category_aggregates.values()
+        lowest = self.price_index.entries.first()
+        highest = self.price_index.entries.last()
+        return {'count': len(self.products), 'categories': len(self.category_aggregates),
+                'units': sum(aggregate.units for aggregate in aggregates),
+                'stock_value': sum(aggregate.stock_value for aggregate in aggregates),
+                'min_price': None if lowest is None else lowest[0],
+                'max_price': None if highest is None else highest[0]}
+
+    # Post the name n-grams that loads and adds leave to the next name search, so that search doesn't pay for them.
+    # Meant to run once after a large load, before reads are served. Returns the number of names posted.
+    def warm_up(self):
+        pending = len(self.name_index.pending)
+        if pending:
+            self.name_index.post_pending()
+        return pending
+
+    # Products whose name contains keyword, or starts with it when prefix is True (not case sensitive).
+    def search_names(self, keyword, prefix=False):
+        return [self.products[pid] for pid in self.name_index.search(keyword, prefix=prefix)]
+
+    # Sort key used for ordered results and page cursors: the product id, or (field value, product id) so ties stay stable.
+    def sort_key(self, product, order_by='product_id'):
+        if order_by is None or order_by == 'product_id':
+            return product.product_id
+        if order_by == 'name':
+            return (self.name_index.names[product.product_id], product.product_id)
+        if order_by in ('price', 'quantity'):
+            return (product.data[order_by], product.product_id)
+        raise ValueError(f"Cannot order by '{order_by}', expected product_id, name, price or quantity.")
+
+    # Helper to cut one page out of a product stream. Unordered pages stop reading the stream once full,
+    # ordered pages use a heap of size offset + limit instead of sorting every match.
+    # after is the sort_key of the last product of the previous page, for cursor based paging.
+    def _page(self, products, limit, offset, order_by, descending, after):
+        Inventory._check_page(limit, offset)
+        # Columnar products are wrappers created as the stream is read, see _collector_paused.
+        with _collector_paused(isinstance(self.products, ColumnarProductStore)):
+            if order_by is None and after is None and not descending:
+                end = None if limit is None else offset + limit
+                return list(islice(products, offset, end))
+            key = lambda product: self.sort_key(product, order_by)
+            if after is not None:
+                if descending:
+                    products = (product for product in products if key(product) < after)
+                else:
+                    products = (product for product in products if key(product) > after)
+            if limit is None:
+                return sorted(products, key=key, reverse=descending)[offset:]
+            select = heapq.nlargest if descending else heapq.nsmallest
+            return select(offset + limit, products, key=key)[offset:]
+
+    # Helper rejecting negative page bounds up front, before islice or a slice would fail or count from the end.
+    @staticmethod
+    def _check_page(limit, offset):
+        if offset < 0 or (limit is not None and limit < 0):
+            raise ValueError(f"Page limit and offset cannot be negative, got limit={limit}, offset={offset}.")
+
+    # Products in sorted order, read lazily from the maintained order indexes. after skips past a sort_key cursor.
+    # The inventory must not change while the stream is read.
+    def iter_sorted(self, order_by='product_id', descending=False, after=None):
+        order, by_id = self._order_index(order_by)
+        if descending:
+            keys = order.irange_reversed(hi=after)
+        else:
+            keys = order.irange(lo=after)
+        if after is not None:
+            # Range bounds are inclusive, the cursor itself was on the previous page.
+            keys = (key for key in keys if key != after)
+        products = self.products
+        if by_id:
+            return (products[key] for key in keys)
+        return (products[key[1]] for key in keys)
+
+    # Helper giving the order index kept for order_by and whether its entries are bare product ids
+    # rather than (value, product id) pairs.
+    def _order_index(self, order_by):
+        if order_by is None or order_by == 'product_id':
+            return self.id_order, True
+        if order_by == 'price':
+            return self.price_index.entries, False
+        if order_by == 'quantity':
+            return self.quantity_index.entries, False
+        if order_by == 'name':
+            return self.name_order.entries, False
+        raise ValueError(f"Cannot order by '{order_by}', expected product_id, name, price or quantity.")
+
+    # List all products in the inventory, optionally one page at a time. Walks the order indexes so
+    # nothing is sorted and only offset + limit products are read.
+    def list_products(self, limit=None, offset=0, order_by=None, descending=False, after=None):
+        self._check_page(limit, offset)
+        products = self.iter_sorted(order_by, descending, after)
+        end = None if limit is None else offset + limit
+        return list(islice(products, offset, end))
+
+    # Vectorized filtering needs NumPy and column arrays to run masks over.
+    def _vectorizable(self):
+        return np is not None and isinstance(self.products, ColumnarProductStore)
+
+    # Ids matching the category, price and quantity criteria, evaluated as boolean masks over the columns in one pass.
+    def _vector_filter_ids(self, category, min_price, max_price, min_quantity, max_quantity):
+        mask = self._vector_mask(category, min_price, max_price, min_quantity, max_quantity)
+        if mask is None:
+            return []
+        ids = self.products.ids
+        return [ids[row] for row in np.flatnonzero(mask).tolist()]
+
+    # Helper giving the row mask of the criteria, None when no row can match.
+    def _vector_mask(self, category, min_price, max_price, min_quantity, max_quantity):
+        store = self.products
+        if not store.ids:
+            return None
+        mask = np.ones(len(store.ids), dtype=bool)
+        if category:
+            code = store.category_lookup.get(category)
+            if code is None:
+                return None
+            mask &= np.frombuffer(store.category_codes, dtype=np.uint32) == code
+        if min_price is not None or max_price is not None:
+            prices = np.frombuffer(store.price, dtype=np.float64)
+            if min_price is not None:
+                mask &= prices >= min_price
+            if max_price is not None:
+                mask &= prices <= max_price
+        if min_quantity is not None or max_quantity is not None:
+            quantities = np.frombuffer(store.quantity, dtype=np.int64)
+            if min_quantity is not None:
+                mask &= quantities >= min_quantity
+            if max_quantity is not None:
+                mask &= quantities <= max_quantity
+        return mask
+
+    # Query planner, picks the cheapest candidate set among the category, range, name and declared indexes and the
+    # vectorized scan. Returns the plan name, its candidate ids (None for every product), the criteria the plan
+    # answers exactly, which are not checked again per product, and the estimated number of rows it reads.
+    # Range and sorted index candidates are read lazily, a caller stopping early never walks the rest.
+    def _plan_candidates(self, category, min_price, max_price, min_quantity, max_quantity,
+                         name_keyword=None, name_prefix=None, attributes=None):
+        plans = self._plan_estimates(category, min_price, max_price, min_quantity, max_quantity,
+                                     name_keyword, name_prefix, attributes)
+        if self._vectorizable() and (category or min_price is not None or max_price is not None or
+                                     min_quantity is not None or max_quantity is not None):
+            # A vectorized pass touches every row but costs a fraction of a Python loop per row. It only answers
+            # category, price and quantity criteria, name or attribute only queries keep their indexes. Every plan
+            # creates products for its matches only, so that cost is the same whichever plan is picked.
+            plans.append((len(self.products) // self.vector_speedup, 'vector', None))
+
+        size, plan, match = min(plans, key=self._plan_cost)
+        if plan == 'scan':
+            return plan, None, _PLAN_COVERS['scan'], size
+        if plan == 'vector':
+            return (plan, self._vector_filter_ids(category, min_price, max_price, min_quantity, max_quantity),
+                    _PLAN_COVERS['vector'], len(self.products))
+        if size == 0:
+            return 'empty', (), _PLAN_COVERS['scan'], 0
+        if match is not None:
+            return plan, match[1](), match[2], size
+        if plan == 'keyword':
+            candidate_ids = self.name_index.search(name_keyword)
+        else:
+            candidate_ids = self.name_index.search(name_prefix, prefix=True)
+        return plan, candidate_ids, _PLAN_COVERS[plan], size
+
+    # Helper giving the cost of a _plan_estimates entry in full scan rows, its estimated candidates times the cost of
+    # reading one. A wide range walk costs more than the scan it would replace.
+    def _plan_cost(self, entry):
+        size, plan, match = entry
+        if plan in ('scan', 'vector'):
+            return size
+        if match is not None and self.indexes[plan.removeprefix('index:')].kind == 'sorted':
+            return size * self.walk_read_cost
+        return size * self.set_read_cost
+
+    # Helper giving (estimated candidates, plan name, index match) for every index that can answer the criteria,
+    # starting with the full scan. Registered indexes give a match, see HashIndex.match, and plans named after
+    # them: the built-in ones by their name ('category', 'price', 'quantity'), declared ones as 'index:<name>'.
+    def _plan_estimates(self, category, min_price, max_price, min_quantity, max_quantity,
+                        name_keyword, name_prefix, attributes):
+        plans = [(len(self.products), 'scan', None)]
+        equals = dict(attributes) if attributes else {}
+        if category:
+            equals['category'] = category
+        ranges = {}
+        if min_price is not None or max_price is not None:
+            ranges['price'] = (min_price, max_price)
+        if min_quantity is not None or max_quantity is not None:
+            ranges['quantity'] = (min_quantity, max_quantity)
+        if equals or ranges:
+            for name, secondary in self.indexes.items():
+                match = secondary.match(equals, ranges)
+                if match is not None:
+                    plans.append((match[0], name if name in _BUILTIN_INDEXES else 'index:' + name, match))
+        if name_keyword:
+            plans.append((self.name_index.estimate(name_keyword), 'keyword', None))
+        if name_prefix:
+            plans.append((self.name_index.estimate(name_prefix), 'prefix', None))
+        return plans
+
+    # Helper dropping the criteria a plan already answered, only the rest are checked per product.
+    @staticmethod
+    def _residual_criteria(covered, category, min_price, max_price, min_quantity, max_quantity,
+                           name_keyword, name_prefix, attributes):
+        if 'category' in covered:
+            category = None
+        if 'price' in covered:
+            min_price = max_price = None
+        if 'quantity' in covered:
+            min_quantity = max_quantity = None
+        if 'name_keyword' in covered:
+            name_keyword = None
+        if 'name_prefix' in covered:
+            name_prefix = None
+        if attributes:
+            attributes = {field: value for field, value in attributes.items() if field not in covered} or None
+        else:
+            attributes = None
+        return category, min_price, max_price, min_quantity, max_quantity, name_keyword, name_prefix, attributes
+
+    # Helper to keep only the ids whose lowercased name holds the keyword and prefix.
+    def _filter_ids_by_name(self, product_ids, name_keyword, name_prefix):
+        lowered_names = self.name_index.names
+        if name_keyword is not None:
+            keyword = name_keyword.lower()
+            product_ids = [pid for pid in product_ids if keyword in lowered_names[pid]]
+        if name_prefix is not None:
+            prefix = name_prefix.lower()
+            product_ids = [pid for pid in product_ids if lowered_names[pid].startswith(prefix)]
+        return product_ids
+
+    # Helper to keep only the ids whose extra attributes hold the given values.
+    def _filter_ids_by_attributes(self, product_ids, attributes):
+        if not attributes:
+            return product_ids
+        products = self.products
+        items = attributes.items()
+        return [pid for pid in product_ids
+                if all(products[pid].data.get(field) == value for field, value in items)]
+
+    # Generator running the per-product criteria checks over the planner candidate ids (None for every product).
+    # Products are looked up one at a time as the stream is read.
+    def _iter_matches(self, candidate_ids, category, min_price, max_price, min_quantity, max_quantity,
+                      name_keyword, name_prefix, attributes=None):
+       # Lowercase the keywords once and compare against the names already lowercased by the name index.
+       keyword = name_keyword.lower() if name_keyword is not None else None
+       prefix = name_prefix.lower() if name_prefix is not None else None
+       lowered_names = self.name_index.names
+       products = self.products
+       candidate = products.values() if candidate_ids is None else map(products.__getitem__, candidate_ids)
+       if self.product_class is CompactProduct:
+           # Compact products are checked on their attributes, skipping the data view.
+           yield from self._iter_compact_matches(candidate, category, min_price, max_price, min_quantity,
+                                                 max_quantity, keyword, prefix, attributes)
+           return
+       if isinstance(products, ColumnarProductStore):
+           # Columnar rows are checked on the columns, wrappers are only created for matches.
+           yield from self._iter_columnar_matches(candidate_ids, category, min_price, max_price, min_quantity,
+                                                  max_quantity, keyword, prefix, attributes)
+           return
 
        for product in candidate:
-            is_match = True
+            data = product.data
+
+            # Category filter (needed when a range index was picked)
+            if category and data['category'] != category:
+                continue
 
             # Price filter
-            if min_price is not None and product.data['price'] < min_price:
-                is_match = False
-            if max_price is not None and product.data['price'] > max_price:
-                is_match = False
+            if min_price is not None and data['price'] < min_price:
+                continue
+            if max_price is not None and data['price'] > max_price:
+                continue
 
             # Quantity filter
-            if min_quantity is not None and product.data['quantity'] < min_quantity:
-                is_match = False
-            if max_quantity is not None and product.data['quantity'] > max_quantity:
-                is_match = False
+            if min_quantity is not None and data['quantity'] < min_quantity:
+                continue
+            if max_quantity is not None and data['quantity'] > max_quantity:
+                continue
+
+            # Name keyword and prefix filters (not case sensitive)
+            if keyword is not None and keyword not in lowered_names[product.product_id]:
+                continue
+            if prefix is not None and not lowered_names[product.product_id].startswith(prefix):
+                continue
+
+            # Extra attribute filters (exact values)
+            if attributes is not None and any(data.get(field) != value for field, value in attributes.items()):
+                continue
+
+            yield product
+
+    # Same checks as _iter_matches read straight from the column arrays, keyword and prefix are already lowercased.
+    def _iter_columnar_matches(self, candidate_ids, category, min_price, max_price, min_quantity, max_quantity,
+                               keyword, prefix, attributes=None):
+        store = self.products
+        ids, price, quantity, codes = store.ids, store.price, store.quantity, store.category_codes
+        lowered_names = self.name_index.names
+        code = None
+        if category:
+            code = store.category_lookup.get(category)
+            if code is None:
+                return
+        candidate_rows = range(len(ids)) if candidate_ids is None else map(store.rows.__getitem__, candidate_ids)
+        for row in candidate_rows:
+            if code is not None and codes[row] != code:
+                continue
+            if min_price is not None and price[row] < min_price:
+                continue
+            if max_price is not None and price[row] > max_price:
+                continue
+            if min_quantity is not None and quantity[row] < min_quantity:
+                continue
+            if max_quantity is not None and quantity[row] > max_quantity:
+                continue
+            product_id = ids[row]
+            if keyword is not None and keyword not in lowered_names[product_id]:
+                continue
+            if prefix is not None and not lowered_names[product_id].startswith(prefix):
+                continue
+            product = ColumnarProduct(store, product_id)
+            if attributes is not None:
+                data = product.data
+                if any(data.get(field) != value for field, value in attributes.items()):
+                    continue
+            yield product
+
+    # Same checks as _iter_matches on CompactProduct attributes, keyword and prefix are already lowercased.
+    def _iter_compact_matches(self, candidate, category, min_price, max_price, min_quantity, max_quantity,
+                              keyword, prefix, attributes=None):
+        lowered_names = self.name_index.names
+        for product in candidate:
+            if category and product.category != category:
+                continue
+            if min_price is not None and product.price < min_price:
+                continue
+            if max_price is not None and product.price > max_price:
+                continue
+            if min_quantity is not None and product.quantity < min_quantity:
+                continue
+            if max_quantity is not None and product.quantity > max_quantity:
+                continue
+            if keyword is not None and keyword not in lowered_names[product.product_id]:
+                continue
+            if prefix is not None and not lowered_names[product.product_id].startswith(prefix):
+                continue
+            if attributes is not None:
+                data = product.data
+                if any(data.get(field) != value for field, value in attributes.items()):
+                    continue
+            yield product
+
+    # Stream of products matching the criteria, in the order of the chosen index. attributes is a dictionary of
+    # extra attributes to match exactly, like attributes={'supplier': "Herman Miller"}.
+    # Products are produced as they are checked, so the inventory must not change while the stream is read.
+    def iter_products(self, category=None, min_price=None, max_price=None,
+                      min_quantity=None, max_quantity=None, name_keyword=None, name_prefix=None, attributes=None):
+        plan, candidate_ids, covered, size = self._plan_candidates(category, min_price, max_price, min_quantity,
+                                                                   max_quantity, name_keyword, name_prefix, attributes)
+        residual = self._residual_criteria(covered, category, min_price, max_price, min_quantity, max_quantity,
+                                           name_keyword, name_prefix, attributes)
+        if plan == 'vector':
+            # Masks already applied the category, price and quantity criteria.
+            matched_ids = self._filter_ids_by_name(candidate_ids, residual[5], residual[6])
+            matched_ids = self._filter_ids_by_attributes(matched_ids, residual[7])
+            if self.plan_observer is not None:
+                self.plan_observer(plan, size, len(matched_ids))
+            return map(partial(ColumnarProduct, self.products), matched_ids)
+        matches = self._iter_matches(candidate_ids, *residual)
+        if self.plan_observer is not None:
+            # The observer gets the plan's estimate, counting the candidates would mean reading them all.
+            return self._observe_matches(self.plan_observer, plan, size, matches)
+        return matches
+
+    # Helper passing matches through while counting them, the observer is told once the stream ends or is closed.
+    @staticmethod
+    def _observe_matches(observer, plan, scanned, matches):
+        returned = 0
+        try:
+            for product in matches:
+                returned += 1
+                yield product
+        finally:
+            observer(plan, scanned, returned)
+
+    #Filter products based on multiple criteria.
+    # attributes is a dictionary of extra attributes to match exactly, see iter_products.
+    # limit and offset select one page, order_by (product_id, name, price or quantity) sorts it with a bounded heap,
+    # after continues from the sort_key of the previous page's last product.
+    def filter_products(self, category=None, min_price=None, max_price =None,
+                        min_quantity=None, max_quantity=None, name_keyword=None, name_prefix=None,
+                        limit=None, offset=0, order_by=None, descending=False, after=None, attributes=None):
+        if self.query_cache is not None:
+            # Cached ids cover every match, the page is cut from them.
+            product_ids = self.filter_product_ids(category, min_price, max_price, min_quantity, max_quantity,
+                                                  name_keyword, name_prefix, attributes)
+            matches = (self.products[pid] for pid in product_ids)
+        else:
+            # Candidates come from the most selective index, remaining criteria are checked per product.
+            matches = self.iter_products(category, min_price, max_price, min_quantity, max_quantity,
+                                         name_keyword, name_prefix, attributes)
+        return self._page(matches, limit, offset, order_by, descending, after)
+
+    # Same criteria as filter_products but returns product ids, on the vectorized path no Product objects are created.
+    def filter_product_ids(self, category=None, min_price=None, max_price=None,
+                           min_quantity=None, max_quantity=None, name_keyword=None, name_prefix=None, attributes=None):
+        cache = self.query_cache
+        if cache is not None:
+            key = (category or None, min_price, max_price, min_quantity, max_quantity,
+                   name_keyword.lower() if name_keyword is not None else None,
+                   name_prefix.lower() if name_prefix is not None else None,
+                   tuple(sorted(attributes.items())) if attributes else None)
+            # Category queries only depend on their category, everything else on the whole catalog.
+            version = self.category_versions.get(category, 0) if category else self.catalog_version
+            cached = cache.get(key, version)
+            if cached is not None:
+                return list(cached)
+
+        plan, candidate_ids, covered, size = self._plan_candidates(category, min_price, max_price, min_quantity,
+                                                                   max_quantity, name_keyword, name_prefix, attributes)
+        residual = self._residual_criteria(covered, category, min_price, max_price, min_quantity, max_quantity,
+                                           name_keyword, name_prefix, attributes)
+        if plan == 'vector':
+            product_ids = self._filter_ids_by_name(candidate_ids, residual[5], residual[6])
+            product_ids = self._filter_ids_by_attributes(product_ids, residual[7])
+        else:
+            product_ids = [product.product_id for product in self._iter_matches(candidate_ids, *residual)]
+        if self.plan_observer is not None:
+            self.plan_observer(plan, size, len(product_ids))
+
+        if cache is not None:
+            cache.put(key, version, product_ids)
+        return product_ids
+
+    # The k products ranked first by key: product_id, name, price, quantity or stock_value (price x quantity),
+    # smallest first or largest first when descending, among those matching the filter_products criteria.
+    # Keys with an order index are walked in order, stopping at the k-th match, when the filters are expected to
+    # let matches through often enough; otherwise the matches go through a heap of size k, O(n log k).
+    def top_k(self, key, k, descending=False, category=None, min_price=None, max_price=None,
+              min_quantity=None, max_quantity=None, name_keyword=None, name_prefix=None, attributes=None):
+        if k <= 0:
+            return []
+        criteria = (category, min_price, max_price, min_quantity, max_quantity, name_keyword, name_prefix)
+        if key == 'stock_value':
+            if self._vectorizable() and name_keyword is None and name_prefix is None and not attributes:
+                return self._vector_top_stock_value(k, descending, *criteria[:5])
+            rank = lambda product: (product.data['price'] * product.data['quantity'], product.product_id)
+        else:
+            order, by_id = self._order_index(key)
+            rank = lambda product: self.sort_key(product, key)
+            # A walk reads about k x (products / matches) entries, matches are at most the best plan's estimate.
+            best = min(size for size, _, _ in self._plan_estimates(*criteria, attributes))
+            if k * len(self.products) < best * best:
+                return self._walk_top_k(order, by_id, key, k, descending, criteria, attributes)
+        select = heapq.nlargest if descending else heapq.nsmallest
+        return select(k, self.iter_products(*criteria, attributes), key=rank)
+
+    # Helper walking an order index from its end (or from the range bound when ranking by a filtered field)
+    # and returning the first k products that pass the criteria.
+    def _walk_top_k(self, order, by_id, key, k, descending, criteria, attributes):
+        low = high = None
+        if key in ('price', 'quantity'):
+            low, high = RangeIndex._bounds(*(criteria[1:3] if key == 'price' else criteria[3:5]))
+        entries = order.irange_reversed(low, high) if descending else order.irange(low, high)
+        candidate_ids = entries if by_id else (entry[1] for entry in entries)
+        observer = self.plan_observer
+        if observer is not None:
+            walked = [0]
+
+            def counted(product_ids):
+                for product_id in product_ids:
+                    walked[0] += 1
+                    yield product_id
+
+            candidate_ids = counted(candidate_ids)
+        result = list(islice(self._iter_matches(candidate_ids, *criteria, attributes or None), k))
+        if observer is not None:
+            observer('ordered:' + (key or 'product_id'), walked[0], len(result))
+        return result
+
+    # Helper ranking stock values with NumPy: a partition finds the k-th value, only rows reaching it are sorted.
+    def _vector_top_stock_value(self, k, descending, category, min_price, max_price, min_quantity, max_quantity):
+        mask = self._vector_mask(category, min_price, max_price, min_quantity, max_quantity)
+        if mask is None:
+            return []
+        store = self.products
+        rows = np.flatnonzero(mask)
+        values = (np.frombuffer(store.price, dtype=np.float64) * np.frombuffer(store.quantity, dtype=np.int64))[rows]
+        if len(rows) > k:
+            if descending:
+                threshold = np.partition(values, len(values) - k)[len(values) - k]
+                rows = rows[values >= threshold]
+            else:
+                threshold = np.partition(values, k - 1)[k - 1]
+                rows = rows[values <= threshold]
+        ids = store.ids
+        candidate = [store[ids[row]] for row in rows.tolist()]
+        select = heapq.nlargest if descending else heapq.nsmallest
+        if self.plan_observer is not None:
+            self.plan_observer('vector', len(ids), min(k, len(candidate)))
+        return select(k, candidate, key=lambda product: (product.data['price'] * product.data['quantity'],
+                                                         product.product_id))
+
+# Read-only view of an inventory at the moment Inventory.snapshot was called. Holds the product table and
+# category sets of that moment, which writers no longer change (see Inventory._writable_table), so long scans
+# need no lock and never see a half applied write. The live indexes have moved on, so scans read the table.
+class InventorySnapshot:
+    def __init__(self, inventory, products, products_by_category):
+        self.inventory = inventory
+        self.products = products
+        self.products_by_category = products_by_category
+        self.catalog_version = inventory.catalog_version
+        # Columnar snapshots hold their own copy and have nothing to release.
+        self.closed = products_by_category is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def __len__(self):
+        return len(self.products)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.inventory._release_snapshot()
+
+    def get_product(self, product_id):
+        return self.products.get(product_id)
+
+    # Snapshot products can't use the live name index, names are lowercased here instead.
+    def sort_key(self, product, order_by='product_id'):
+        if order_by == 'name':
+            return (product.data['name'].lower(), product.product_id)
+        return Inventory.sort_key(self, product, order_by)
+
+    _page = Inventory._page
+
+    # Stream of products matching the criteria, same criteria as Inventory.filter_products.
+    def iter_products(self, category=None, min_price=None, max_price=None,
+                      min_quantity=None, max_quantity=None, name_keyword=None, name_prefix=None, attributes=None):
+        if category and self.products_by_category is not None:
+            products = self.products
+            candidate = (products[pid] for pid in self.products_by_category.get(category, ()))
+        else:
+            candidate = self.products.values()
+        keyword = name_keyword.lower() if name_keyword is not None else None
+        prefix = name_prefix.lower() if name_prefix is not None else None
+        for product in candidate:
+            data = product.data
+            if category and data['category'] != category:
+                continue
+            if min_price is not None and data['price'] < min_price:
+                continue
+            if max_price is not None and data['price'] > max_price:
+                continue
+            if min_quantity is not None and data['quantity'] < min_quantity:
+                continue
+            if max_quantity is not None and data['quantity'] > max_quantity:
+                continue
+            if keyword is not None and keyword not in data['name'].lower():
+                continue
+            if prefix is not None and not data['name'].lower().startswith(prefix):
+                continue
+            if attributes and any(data.get(field) != value for field, value in attributes.items()):
+                continue
+            yield product
 
-            # Name keyword filter (not case sensitive)
-            if name_keyword is not None and name_keyword.lower() not in product.data['name'].lower():
-                is_match = False
+    def filter_products(self, category=None, min_price=None, max_price=None,
+                        min_quantity=None, max_quantity=None, name_keyword=None, name_prefix=None,
+                        limit=None, offset=0, order_by=None, descending=False, after=None, attributes=None):
+        matches = self.iter_products(category, min_price, max_price, min_quantity, max_quantity,
+                                     name_keyword, name_prefix, attributes)
+        return self._page(matches, limit, offset, order_by, descending, after)
 
-            if is_match:
-                filtered_results.append(product)
+    def filter_product_ids(self, category=None, min_price=None, max_price=None,
+                           min_quantity=None, max_quantity=None, name_keyword=None, name_prefix=None, attributes=None):
+        return [product.product_id for product in self.iter_products(category, min_price, max_price, min_quantity,
+                                                                     max_quantity, name_keyword, name_prefix,
+                                                                     attributes)]
 
-        # Results sorted by product id.
-       return filtered_results
+    # Every product of the snapshot in product id (or order_by) order, one page when limit or after is given.
+    def list_products(self, limit=None, offset=0, order_by=None, descending=False, after=None):
+        return self._page(iter(self.products.values()), limit, offset, order_by or 'product_id', descending, after)
+
+# Reader-writer lock, any number of readers or a single writer. Waiting writers block new readers so a
+# steady stream of filters cannot starve updates. Reentrant per thread, a writer may also read.
+class ReadWriteLock:
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    def acquire_read(self):
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            # Already holding the read or write lock in this thread.
+            self._local.depth = depth + 1
+            return
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        self._local.depth = 1
+
+    def release_read(self):
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            self._local.depth += 1
+            return
+        if getattr(self._local, 'depth', 0):
+            raise RuntimeError("Cannot upgrade a read lock to a write lock.")
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+        self._local.depth = 1
+
+    def release_write(self):
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+        with self._cond:
+            self._writer = None
+            self._cond.notify_all()
+
+    # True when the calling thread holds the read or write lock.
+    def held(self):
+        return getattr(self._local, 'depth', 0) > 0
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+# Helpers wrapping an Inventory method so it runs under the instance read or write lock.
+def _with_read_lock(method):
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.read_locked():
+            return method(self, *args, **kwargs)
+    return locked
+
+def _with_write_lock(method):
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.write_locked():
+            return method(self, *args, **kwargs)
+    return locked
+
+# Thread-safe inventory. Reads and filters share a reader-writer lock and run side by side, each write holds
+# the lock exclusively so the product table and every index change together.
+class ConcurrentInventory(Inventory):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = ReadWriteLock()
+
+    get_product = _with_read_lock(Inventory.get_product)
+    get_products = _with_read_lock(Inventory.get_products)
+    list_products = _with_read_lock(Inventory.list_products)
+    filter_products = _with_read_lock(Inventory.filter_products)
+    filter_product_ids = _with_read_lock(Inventory.filter_product_ids)
+    search_names = _with_read_lock(Inventory.search_names)
+    category_summary = _with_read_lock(Inventory.category_summary)
+    low_stock_products = _with_read_lock(Inventory.low_stock_products)
+    top_k = _with_read_lock(Inventory.top_k)
+    stats = _with_read_lock(Inventory.stats)
+
+    add_product = _with_write_lock(Inventory.add_product)
+    remove_product = _with_write_lock(Inventory.remove_product)
+    update_price = _with_write_lock(Inventory.update_price)
+    update_quantity = _with_write_lock(Inventory.update_quantity)
+    bulk_upsert = _with_write_lock(Inventory.bulk_upsert)
+    bulk_load = _with_write_lock(Inventory.bulk_load)
+    warm_up = _with_write_lock(Inventory.warm_up)
+    reserve = _with_write_lock(Inventory.reserve)
+    commit = _with_write_lock(Inventory.commit)
+    release = _with_write_lock(Inventory.release)
+    set_reorder_point = _with_write_lock(Inventory.set_reorder_point)
+    add_stock_alert = _with_write_lock(Inventory.add_stock_alert)
+    remove_stock_alert = _with_write_lock(Inventory.remove_stock_alert)
+    compact = _with_write_lock(Inventory.compact)
+    add_index = _with_write_lock(Inventory.add_index)
+    drop_index = _with_write_lock(Inventory.drop_index)
+    # Taking a snapshot marks the table shared, so it waits for writers. Reading it needs no lock.
+    snapshot = _with_write_lock(Inventory.snapshot)
+    available_quantity = _with_read_lock(Inventory.available_quantity)
+    add_listener = _with_write_lock(Inventory.add_listener)
+    remove_listener = _with_write_lock(Inventory.remove_listener)
+
+    # Streams handed to callers are read after the call returns, so they are collected while the read lock is held.
+    # Calls from inside a locked method stay lazy.
+    def iter_products(self, *args, **kwargs):
+        if self.lock.held():
+            return super().iter_products(*args, **kwargs)
+        with self.lock.read_locked():
+            return iter(list(super().iter_products(*args, **kwargs)))
+
+    def iter_sorted(self, *args, **kwargs):
+        if self.lock.held():
+            return super().iter_sorted(*args, **kwargs)
+        with self.lock.read_locked():
+            return iter(list(super().iter_sorted(*args, **kwargs)))
 
 # Generate a large dataset for testing.    
-def generate_large_ds(size):
-    inventory = Inventory()
+def generate_large_ds(size, storage='dict'):
+    inventory = Inventory(storage)
     categories = ["Lounge", "Chairs", "Tables", "Case Goods"]
+    rows = []
     for i in range(size):
         product_id = i + 1
         name = f"Product : {product_id}"
         price = round(random.uniform(10, 1000), 2)
         quantity = random.randint(0, 100)
         category = random.choice(categories)
-        inventory.add_product(product_id, name, price, quantity, category)
+        rows.append((product_id, name, price, quantity, category))
+    # Loading the rows in one batch instead of calling add_product per row, then posting the name n-grams.
+    inventory.bulk_load(rows)
+    inventory.warm_up()
     return inventory
 
+# Compare memory per product for dictionary, compact and columnar storage: the product table alone, the whole
+# inventory with every index right after bulk_load, and again after the first name search posts the name trigrams.
+def measure_storage_memory(size):
+    results = {}
+    categories = ["Lounge", "Chairs", "Tables", "Case Goods"]
+    rows = [(i + 1, f"Product : {i + 1}", round(random.uniform(10, 1000), 2), random.randint(0, 100),
+             random.choice(categories)) for i in range(size)]
+    # The rows are built before tracing starts, so the name strings every table points to are counted by none of them.
+    for storage in ('dict', 'compact', 'columnar'):
+        tracemalloc.start()
+        if storage == 'dict':
+            table = {row[0]: Product(*row) for row in rows}
+        elif storage == 'compact':
+            table = {row[0]: CompactProduct(*row) for row in rows}
+        else:
+            table = ColumnarProductStore()
+            for row in rows:
+                table.put(*row)
+        table_used, _ = tracemalloc.get_traced_memory()
+        del table
+        tracemalloc.clear_traces()
+        inventory = Inventory(storage)
+        inventory.bulk_load(rows)
+        loaded, _ = tracemalloc.get_traced_memory()
+        inventory.search_names("product : 1")
+        searched, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[storage] = {'table': table_used / size, 'inventory': loaded / size, 'searched': searched / size}
+        del inventory
+    return results
+
 def run_performance_testing():
     # Performs performance testing on inventory operations on different dataset sizes.
     print("---Performance Testing Optimized Version---")
@@ -207,6 +2593,15 @@ def run_performance_testing():
         elapsed_time = ((end_time - start_time) * 1000)
         print(f" Removing Product Running Time: {elapsed_time} milliseconds.")
 
+    # Memory per product for each storage, measured after the timings so tracing does not slow them. Columnar storage
+    # cuts the product table to under half, but the range, order and name indexes cost the same per product whatever
+    # the storage, so the whole inventory only shrinks by about a quarter (see README).
+    print("\n---Inventory Memory (bytes/product: table / inventory / after first name search)---")
+    for size in sizes + [1000000]:
+        memory = measure_storage_memory(size)
+        print(f" {size} products: " + ", ".join(f"{storage} {used['table']:.0f} / {used['inventory']:.0f} / "
+                                               f"{used['searched']:.0f}" for storage, used in memory.items()) + ".")
+
 # Advanced Testing and Validation
 def run_advance_testing():
     print("---Advanced Testing and Validation---")
@@ -255,6 +2650,377 @@ def run_advance_testing():
     assert len(filtered_keyword) == 1 and filtered_keyword[0].product_id == 203, "Test Case 5 Failed: Filter by name keyword."
     print("Test Case 5 Passed.")
 
+    # Test Case 6: Range indexes follow price and quantity updates
+    print("Test Case 6: Range index maintenance.")
+    inventory.update_price(201, 299.99)
+    inventory.update_quantity(203, -30)
+    filtered_price = inventory.filter_products(min_price=280, max_price=300)
+    assert [p.product_id for p in filtered_price] == [201], "Test Case 6 Failed: Price index not updated."
+    filtered_quantity = inventory.filter_products(max_quantity=0)
+    assert [p.product_id for p in filtered_quantity] == [203], "Test Case 6 Failed: Quantity index not updated."
+    assert inventory.filter_products(category="Missing", min_price=0) == [], "Test Case 6 Failed: Unknown category should match nothing."
+    # A range covering most products is read faster by a scan than by walking the price index.
+    ranged = Inventory()
+    ranged.bulk_load([(i, f"Item {i}", float(i), i % 50, "Tables") for i in range(1, 1001)])
+    plans = []
+    ranged.plan_observer = lambda plan, scanned, returned: plans.append(plan)
+    assert ranged.filter_product_ids(min_price=100) == list(range(100, 1001)) and plans[-1] == 'scan', "Test Case 6 Failed: Wide range walked the index."
+    assert ranged.filter_product_ids(min_price=500, max_price=510) == list(range(500, 511)) and plans[-1] == 'price', "Test Case 6 Failed: Narrow range not indexed."
+    print("Test Case 6 Passed.")
+
+    # Test Case 7: Trigram name index, prefix and short keyword search
+    print("Test Case 7: Name index search.")
+    named = Inventory()
+    named.add_product(1401, "Oak Desk", 520.00, 3, "Tables")
+    named.add_product(1402, "Desk Lamp", 45.00, 20, "Case Goods")
+    named.add_product(1403, "Ox", 10.00, 1, "Case Goods")
+    named.add_product(1404, "Standing Desk", 780.00, 2, "Tables")
+    assert sorted(product.product_id for product in named.search_names("DESK")) == [1401, 1402, 1404], "Test Case 7 Failed: Keyword search."
+    assert [product.product_id for product in named.filter_products(name_prefix="desk")] == [1402], "Test Case 7 Failed: Prefix filter."
+    assert sorted(product.product_id for product in named.search_names("o")) == [1401, 1403], "Test Case 7 Failed: One letter keyword."
+    assert [product.product_id for product in named.search_names("ox")] == [1403], "Test Case 7 Failed: Short name."
+    assert [product.product_id for product in named.search_names("st", prefix=True)] == [1404], "Test Case 7 Failed: Short prefix."
+    named.add_product(1401, "Walnut Desk", 520.00, 3, "Tables")
+    named.remove_product(1402)
+    assert named.search_names("oak") == [] and sorted(product.product_id for product in named.filter_products(name_keyword="desk")) == [1401, 1404], "Test Case 7 Failed: Renames and removals."
+    print("Test Case 7 Passed.")
+
+    # Test Case 8: Columnar storage behind the same API
+    print("Test Case 8: Columnar storage.")
+    columnar = Inventory(storage='columnar')
+    columnar.add_product(301, "Lounge Chair", 899.99, 4, "Lounge")
+    columnar.add_product(302, "Side Table", 199.99, 9, "Tables")
+    columnar.update_quantity(301, 6)
+    columnar.add_product(302, "Side Table", 199.99, 9, "Case Goods")
+    columnar.remove_product(301)
+    product = columnar.get_product(302)
+    assert product.data['category'] == "Case Goods" and len(columnar.products) == 1, "Test Case 8 Failed: Columnar update not applied."
+    assert columnar.filter_products(category="Case Goods", max_price=200) == [product], "Test Case 8 Failed: Columnar filter."
+    try:
+        columnar.update_quantity(302, 1.5)
+        rejected = False
+    except ValueError:
+        rejected = True
+    assert rejected and product.data['quantity'] == 9 and columnar.filter_product_ids(max_quantity=9) == [302], "Test Case 8 Failed: Float quantity accepted."
+    detached = product.copy()
+    detached.data['quantity'] = 1
+    assert type(detached) is Product and product.data['quantity'] == 9, "Test Case 8 Failed: Copy still tied to the columns."
+    vectorized = Inventory(storage='columnar')
+    vectorized.bulk_load([(i, f"Item {i}", 10.0 + i, i % 7, "Tables" if i % 2 else "Chairs") for i in range(1, 201)])
+    plans = []
+    vectorized.plan_observer = lambda plan, scanned, returned: plans.append(plan)
+    expected = [i for i in range(1, 201) if i % 2 and 10.0 + i >= 100 and i % 7 >= 3]
+    assert sorted(vectorized.filter_product_ids(category="Tables", min_price=100, min_quantity=3)) == expected, "Test Case 8 Failed: Column filter."
+    assert np is None or plans[-1] == 'vector', "Test Case 8 Failed: Vectorized plan not used."
+    assert sorted(vectorized.filter_product_ids(name_keyword="Item 4")) == [4] + list(range(40, 50)) and plans[-1] == 'keyword', "Test Case 8 Failed: Name query left its index."
+    # Same query as if NumPy were not installed.
+    module = sys.modules[__name__]
+    numpy_module, module.np = module.np, None
+    fallback = sorted(vectorized.filter_product_ids(category="Tables", min_price=100, min_quantity=3))
+    fallback_products = vectorized.filter_products(category="Tables", min_price=100, min_quantity=3, name_keyword="1")
+    module.np = numpy_module
+    assert fallback == expected and plans[-1] != 'vector', "Test Case 8 Failed: Fallback without NumPy."
+    assert sorted(p.product_id for p in fallback_products) == [i for i in expected if "1" in str(i)], "Test Case 8 Failed: Column checks without NumPy."
+    print("Test Case 8 Passed.")
+
+    # Test Case 9: Bulk loading rows and columns
+    print("Test Case 9: Bulk load and upsert.")
+    bulk = Inventory()
+    stats = bulk.bulk_load([(401, "Task Chair", 149.99, 30, "Chairs"), (402, "Bench", 349.99, 5, "Lounge")])
+    assert stats['inserted'] == 2 and stats['rows_per_sec'] > 0, "Test Case 9 Failed: Bulk load counts."
+    stats = bulk.bulk_upsert({'product_id': [402, 403], 'name': ["Long Bench", "Stool"], 'price': [399.99, 89.99],
+                              'quantity': [5, 12], 'category': ["Lounge", "Chairs"]})
+    assert stats['inserted'] == 1 and stats['updated'] == 1, "Test Case 9 Failed: Bulk upsert counts."
+    assert [p.product_id for p in bulk.filter_products(category="Chairs", max_price=100)] == [403], "Test Case 9 Failed: Indexes not built."
+    assert bulk.warm_up() == 3 and not bulk.name_index.pending and bulk.warm_up() == 0, "Test Case 9 Failed: Warm-up."
+    assert [p.product_id for p in bulk.search_names("long")] == [402], "Test Case 9 Failed: Name index not updated."
+    packed = Inventory(storage='columnar')
+    packed.bulk_load([(404, "Ottoman", 99.99, 3, "Lounge")])
+    rejected = 0
+    for inventory_under_test, rows in ((bulk, [(405, "Pouf", 59.99, 3, "Lounge"), (406, "Stool", None, 2, "Lounge")]),
+                                       (packed, [(405, "Pouf", 59.99, 3, "Lounge"), (406, "Stool", 49.99, 1.5, "Lounge")])):
+        try:
+            inventory_under_test.bulk_upsert(rows)
+        except ValueError:
+            rejected += 1
+    assert rejected == 2 and bulk.get_product(405) is None and packed.get_product(405) is None, "Test Case 9 Failed: Bad batch applied."
+    assert bulk.filter_product_ids(category="Lounge") == [402] and packed.filter_product_ids(category="Lounge", min_price=0) == [404], "Test Case 9 Failed: Indexes out of step."
+    print("Test Case 9 Passed.")
+
+    # Test Case 10: Pages by limit, offset and cursor, in both directions
+    print("Test Case 10: Paged listings and filters.")
+    paged = Inventory()
+    paged.bulk_load([(1600 + i, f"Shelf {i}", 100.0 + 10 * (i % 5), i, "Case Goods" if i % 2 else "Tables") for i in range(1, 11)])
+    assert [product.product_id for product in paged.list_products(limit=3, offset=2)] == [1603, 1604, 1605], "Test Case 10 Failed: Limit and offset."
+    page = paged.filter_products(category="Case Goods", limit=2, order_by='price')
+    assert [product.product_id for product in page] == [1605, 1601], "Test Case 10 Failed: First ordered page."
+    page = paged.filter_products(category="Case Goods", limit=2, order_by='price', after=paged.sort_key(page[-1], 'price'))
+    assert [product.product_id for product in page] == [1607, 1603], "Test Case 10 Failed: Cursor page."
+    assert [product.product_id for product in paged.filter_products(category="Case Goods", limit=2, offset=1, order_by='price')] == [1601, 1607], "Test Case 10 Failed: Ordered offset."
+    page = paged.list_products(limit=3, order_by='price', descending=True)
+    assert [product.product_id for product in page] == [1609, 1604, 1608], "Test Case 10 Failed: Descending page."
+    page = paged.list_products(limit=2, order_by='price', descending=True, after=paged.sort_key(page[1], 'price'))
+    assert [product.product_id for product in page] == [1608, 1603], "Test Case 10 Failed: Descending cursor."
+    rejected = 0
+    for bad_page in ({'offset': -1}, {'limit': -2}):
+        for listing in (paged.list_products, paged.filter_products):
+            try:
+                listing(**bad_page)
+            except ValueError:
+                rejected += 1
+    assert rejected == 4, "Test Case 10 Failed: Negative page bounds accepted."
+    print("Test Case 10 Passed.")
+
+    # Test Case 11: Maintained id, name, price and quantity orders
+    print("Test Case 11: Sorted iteration.")
+    ordered = Inventory()
+    ordered.bulk_load([(1503, "Bench", 300.00, 4, "Lounge"), (1501, "Armchair", 450.00, 2, "Chairs")])
+    ordered.add_product(1502, "Credenza", 1200.00, 1, "Case Goods")
+    ordered.add_product(1501, "Sofa", 450.00, 2, "Lounge")
+    ordered.remove_product(1503)
+    ordered.add_product(1504, "bench", 150.00, 7, "Lounge")
+    assert list(ordered.id_order) == [1501, 1502, 1504], "Test Case 11 Failed: Id order."
+    assert list(ordered.name_order.entries) == [("bench", 1504), ("credenza", 1502), ("sofa", 1501)], "Test Case 11 Failed: Name order."
+    assert [product.product_id for product in ordered.iter_sorted('name')] == [1504, 1502, 1501], "Test Case 11 Failed: Sorted by name."
+    assert [product.product_id for product in ordered.iter_sorted('price', descending=True)] == [1502, 1501, 1504], "Test Case 11 Failed: Descending price."
+    cursor = ordered.sort_key(ordered.get_product(1501), 'price')
+    assert [product.product_id for product in ordered.iter_sorted('price', descending=True, after=cursor)] == [1504], "Test Case 11 Failed: Descending cursor."
+    keys = SortedKeyList(range(0, 5000, 2))
+    assert list(keys.irange_reversed(11, 4001)) == list(range(4000, 11, -2)) and list(keys.irange_reversed(hi=3)) == [2, 0], "Test Case 11 Failed: Reversed range."
+    print("Test Case 11 Passed.")
+
+    # Test Case 12: Query cache hits and per-category invalidation
+    print("Test Case 12: Query result cache.")
+    cached = Inventory(cache_size=16)
+    cached.bulk_load([(501, "Desk", 469.99, 20, "Tables"), (502, "Stool", 89.99, 12, "Chairs")])
+    cached.filter_products(category="Tables", min_price=100)
+    cached.filter_products(category="Tables", min_price=100)
+    cached.filter_products(min_price=50)
+    assert cached.query_cache.hits == 1, "Test Case 12 Failed: Repeated query not served from cache."
+    cached.update_price(502, 99.99)
+    tables = cached.filter_products(category="Tables", min_price=100)
+    assert cached.query_cache.hits == 2 and [p.product_id for p in tables] == [501], "Test Case 12 Failed: Other category invalidated."
+    everything = cached.filter_products(min_price=50)
+    assert cached.query_cache.invalidations == 1 and len(everything) == 2, "Test Case 12 Failed: Catalog query not invalidated."
+    print("Test Case 12 Passed.")
+
+    # Test Case 13: Concurrent writers keep the category index consistent
+    print("Test Case 13: Concurrent inventory.")
+    shared = ConcurrentInventory()
+    def order_intake(start):
+        for product_id in range(start, start + 500):
+            shared.add_product(product_id, f"Threaded Product {product_id}", 10.0, 5, random.choice(["Lounge", "Chairs"]))
+            shared.filter_products(category="Chairs", max_quantity=5)
+    workers = [threading.Thread(target=order_intake, args=(start,)) for start in range(0, 2000, 500)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    indexed = sum(len(ids) for ids in shared.products_by_category.values())
+    assert len(shared.products) == 2000 and indexed == 2000, "Test Case 13 Failed: Category index inconsistent."
+    print("Test Case 13 Passed.")
+
+    # Test Case 14: Batch reservations
+    print("Test Case 14: Reserve, commit and release stock.")
+    orders = Inventory()
+    orders.bulk_load([(601, "Sofa", 1299.99, 3, "Lounge"), (602, "Lamp", 59.99, 10, "Case Goods")])
+    assert orders.reserve({601: 4, 602: 1}) is None, "Test Case 14 Failed: Short order should be rejected."
+    held = orders.reserve({601: 2, 602: 4})
+    partial = orders.reserve([(601, 2), (602, 1)], partial=True)
+    assert partial.lines == {601: 1, 602: 1} and partial.shortages == {601: 1}, "Test Case 14 Failed: Partial fill."
+    assert orders.commit(held.reservation_id) and orders.release(partial.reservation_id), "Test Case 14 Failed: Commit or release."
+    assert orders.get_product(601).data['quantity'] == 1 and orders.available_quantity(602) == 6, "Test Case 14 Failed: Stock not decremented."
+    assert not orders.reserved and not orders.commit(held.reservation_id), "Test Case 14 Failed: Reservation not closed."
+    orders.add_product(603, "Rug", 199.99, 10, "Case Goods")
+    stale = orders.reserve({603: 8, 602: 1})
+    only_rug = orders.reserve({603: 1})
+    orders.remove_product(603)
+    orders.add_product(603, "Rug", 199.99, 5, "Case Goods")
+    assert orders.reserve({603: 3}) is not None and orders.commit(stale.reservation_id), "Test Case 14 Failed: Removed product still reserved."
+    assert orders.get_product(603).data['quantity'] == 5 and only_rug.status == 'released', "Test Case 14 Failed: Old hold taken from new product."
+    orders.bulk_load([(603, "Rug", 199.99, 5, "Case Goods")])
+    assert not orders.reserved and not orders.reservations and orders.available_quantity(603) == 5, "Test Case 14 Failed: Reload kept holds."
+    print("Test Case 14 Passed.")
+
+    # Test Case 15: Change feed deltas, resumable cursors and ring buffer retention
+    print("Test Case 15: Change feed cursors.")
+    feed_inventory = Inventory(feed_size=4)
+    cursor = feed_inventory.change_feed.cursor()
+    feed_inventory.add_product(701, "Side Table", 149.99, 8, "Tables")
+    feed_inventory.update_price(701, 139.99)
+    events = cursor.poll()
+    assert [(event[0], event[1]) for event in events] == [(1, 'add'), (2, 'update')], "Test Case 15 Failed: Missing events."
+    assert events[1][3] == {'price': 139.99} and cursor.lag() == 0, "Test Case 15 Failed: Update delta."
+    feed_inventory.update_quantity(701, -3)
+    feed_inventory.remove_product(701)
+    resumed = feed_inventory.change_feed.cursor(cursor.position)
+    assert [event[1] for event in resumed.poll()] == ['update', 'remove'], "Test Case 15 Failed: Resumed cursor."
+    feed_inventory.add_product(702, "Ottoman", 99.99, 4, "Lounge")
+    try:
+        feed_inventory.change_feed.read(0)
+        expired = False
+    except CursorExpired:
+        expired = True
+    assert expired, "Test Case 15 Failed: Dropped events should expire the cursor."
+    print("Test Case 15 Passed.")
+
+    # Test Case 16: Category aggregates follow adds, updates, category changes and removals
+    print("Test Case 16: Category and inventory aggregates.")
+    totals = Inventory()
+    totals.bulk_load([(801, "Armchair", 450.00, 4, "Chairs"), (802, "Stool", 80.00, 10, "Chairs")])
+    totals.add_product(803, "Bench", 300.00, 2, "Chairs")
+    totals.update_quantity(802, -5)
+    totals.add_product(801, "Armchair", 450.00, 4, "Lounge")
+    chairs = totals.category_summary("Chairs")
+    assert chairs == {'count': 2, 'units': 7, 'stock_value': 1000.00, 'min_price': 80.00, 'max_price': 300.00}, "Test Case 16 Failed: Chairs totals."
+    totals.remove_product(801)
+    assert totals.category_summary("Lounge") is None, "Test Case 16 Failed: Empty category kept."
+    summary = totals.stats()
+    assert summary['count'] == 2 and summary['units'] == 7 and summary['max_price'] == 300.00, "Test Case 16 Failed: Inventory totals."
+    # Chairs prices end up between Lounge prices, the price index walk gives up and reads the Chairs products.
+    totals.bulk_upsert([(810 + i, f"Sofa {i}", 500.00 + i, 1, "Lounge") for i in range(20)])
+    totals.update_price(802, 510.50)
+    chairs, lounge = totals.category_summary("Chairs"), totals.category_summary("Lounge")
+    assert (chairs['min_price'], chairs['max_price'], chairs['count']) == (300.00, 510.50, 2), "Test Case 16 Failed: Chairs price range."
+    assert (lounge['min_price'], lounge['max_price'], lounge['count']) == (500.00, 519.00, 20), "Test Case 16 Failed: Lounge price range."
+    # Bad values are rejected before the product table or any index changes.
+    listed = [product.product_id for product in totals.list_products()]
+    rejected = 0
+    for call in (lambda: totals.add_product(804, "Ottoman", None, 5, "Chairs"),
+                 lambda: totals.add_product(805, None, 9.99, 1, "Chairs"),
+                 lambda: totals.add_product(806, "Pouf", "12.50", 1, "Chairs"),
+                 lambda: totals.add_product(807, "Rug", 9.99, 1, ["Chairs"]),
+                 lambda: totals.add_product(803, "Bench", "300.00", 2, "Chairs"),
+                 lambda: totals.update_price(802, "12.50")):
+        try:
+            call()
+        except (ValueError, TypeError):
+            rejected += 1
+    assert rejected == 6 and [product.product_id for product in totals.list_products()] == listed, "Test Case 16 Failed: Bad values applied."
+    assert totals.category_summary("Chairs") == chairs and totals.filter_product_ids(max_price=100) == [], "Test Case 16 Failed: Indexes changed by bad values."
+    totals.add_product(804, "Ottoman", 99.99, 5, "Chairs")
+    totals.update_price(804, 89.99)
+    assert totals.remove_product(804) and totals.get_product(804) is None, "Test Case 16 Failed: Product after bad values."
+    print("Test Case 16 Passed.")
+
+    # Test Case 17: Low stock set and threshold-crossing alerts
+    print("Test Case 17: Reorder points and low stock alerts.")
+    stock = Inventory()
+    alerts = []
+    stock.add_stock_alert(lambda product_id, quantity, reorder_point, low: alerts.append((product_id, low)))
+    stock.bulk_load([(901, "Desk Lamp", 49.99, 12, "Case Goods"), (902, "Floor Lamp", 89.99, 3, "Case Goods")])
+    stock.set_reorder_point(901, 10)
+    stock.set_reorder_point(902, 5)
+    stock.update_quantity(901, -4)
+    stock.update_quantity(901, -1)
+    assert [product.product_id for product in stock.low_stock_products()] == [901, 902], "Test Case 17 Failed: Low stock set."
+    stock.update_quantity(902, 10)
+    stock.remove_product(901)
+    assert stock.low_stock_products() == [] and alerts == [(902, True), (901, True), (902, False)], "Test Case 17 Failed: Alerts."
+    print("Test Case 17 Passed.")
+
+    # Test Case 18: Compact slotted products behave like dictionary backed ones
+    print("Test Case 18: Compact product storage.")
+    compact = Inventory(storage='compact')
+    compact.bulk_load([(1001, "Loveseat", 799.99, 6, "Lounge"), (1002, "Loveseat Cover", 59.99, 40, "Lounge")])
+    compact.add_product(1003, "Club Chair", 649.99, 3, "".join(["Lou", "nge"]))
+    compact.update_price(1002, 49.99)
+    compact.add_product(1001, "Loveseat", 799.99, 2, "Chairs")
+    product = compact.get_product(1002)
+    assert product == Product(1002, "Other", 1.0, 1, "Tables") and product.data['price'] == 49.99, "Test Case 18 Failed: Compact update."
+    assert compact.get_product(1003).category is product.category, "Test Case 18 Failed: Category not interned."
+    assert compact.filter_products(name_keyword="loveseat") == [compact.get_product(1001), product], "Test Case 18 Failed: Compact filter."
+    assert compact.filter_products(category="Chairs", min_quantity=2) == [compact.get_product(1001)], "Test Case 18 Failed: Category move."
+    compact.bulk_load([(1004, "Crate", 19.99, 5, 7), (1005, "Crate Lid", 4.99, 5, None)])
+    compact.add_product(1004, "Crate", 19.99, 5, 8)
+    assert compact.filter_product_ids(category=8) == [1004] and compact.get_product(1005).data['category'] is None, "Test Case 18 Failed: Non-string categories."
+    print("Test Case 18 Passed.")
+
+    # Test Case 19: Snapshots keep the catalog as it was while writes continue
+    print("Test Case 19: Point in time snapshots.")
+    versioned = Inventory()
+    versioned.bulk_load([(1101, "Dining Table", 1200.00, 5, "Tables"), (1102, "Dining Chair", 150.00, 24, "Chairs")])
+    with versioned.snapshot() as view:
+        versioned.update_price(1101, 999.00)
+        versioned.add_product(1102, "Dining Chair", 150.00, 0, "Lounge")
+        versioned.add_product(1103, "Sideboard", 1500.00, 2, "Case Goods")
+        versioned.remove_product(1101)
+        assert view.get_product(1101).data['price'] == 1200.00 and view.get_product(1103) is None, "Test Case 19 Failed: Snapshot saw writes."
+        assert view.filter_products(category="Chairs", min_quantity=20) == [view.get_product(1102)], "Test Case 19 Failed: Snapshot categories."
+        assert [product.product_id for product in view.list_products(order_by='price')] == [1102, 1101], "Test Case 19 Failed: Snapshot listing."
+    assert versioned.get_product(1102).data['quantity'] == 0 and versioned.filter_products(category="Lounge") == [versioned.get_product(1102)], "Test Case 19 Failed: Live writes lost."
+    assert versioned._open_snapshots == 0, "Test Case 19 Failed: Snapshot not released."
+    print("Test Case 19 Passed.")
+
+    # Test Case 20: Declared hash and sorted indexes over extra attributes
+    print("Test Case 20: Declared secondary indexes.")
+    indexed = Inventory()
+    indexed.add_product(1201, "Aeron Chair", 1400.00, 6, "Chairs", supplier="Herman Miller")
+    indexed.add_product(1202, "Eames Chair", 900.00, 3, "Chairs", supplier="Herman Miller")
+    indexed.add_product(1203, "Tulip Table", 2100.00, 2, "Tables", supplier="Knoll")
+    indexed.add_product(1204, "Side Table", 400.00, 8, "Tables", supplier="Knoll")
+    # Enough other products that reading an index beats a scan.
+    indexed.bulk_upsert([(i, f"Bar Stool {i}", 1500.00, 1, "Chairs") for i in range(1, 41)])
+    indexed.add_index('supplier', 'supplier')
+    indexed.add_index('category_price', ('category', 'price'), kind='sorted')
+    plans = []
+    indexed.plan_observer = lambda plan, scanned, returned: plans.append(plan)
+    assert indexed.filter_product_ids(attributes={"supplier": "Herman Miller"}) == [1201, 1202] and plans[-1] == 'index:supplier', "Test Case 20 Failed: Hash index not used."
+    assert indexed.filter_product_ids(category="Chairs", max_price=1000) == [1202] and plans[-1] == 'index:category_price', "Test Case 20 Failed: Sorted index not used."
+    indexed.update_price(1201, 850.00)
+    indexed.add_product(1203, "Tulip Table", 2100.00, 2, "Chairs", supplier="Herman Miller")
+    indexed.remove_product(1202)
+    assert indexed.filter_product_ids(category="Chairs", max_price=1000, attributes={"supplier": "Herman Miller"}) == [1201], "Test Case 20 Failed: Indexes not maintained."
+    assert indexed.filter_product_ids(attributes={"supplier": "Knoll"}) == [1204] and indexed.get_product(1203).data['supplier'] == "Herman Miller", "Test Case 20 Failed: Stale index entry."
+    indexed.drop_index('supplier')
+    assert indexed.filter_product_ids(attributes={"supplier": "Herman Miller"}) == [1201, 1203] and plans[-1] == 'scan', "Test Case 20 Failed: Dropped index still used."
+    # The category, price and quantity indexes are registered built-ins, kept up to date like the declared ones.
+    try:
+        indexed.drop_index('category')
+        dropped = True
+    except ValueError:
+        dropped = False
+    assert not dropped and list(indexed.indexes) == ['category', 'price', 'quantity', 'category_price'], "Test Case 20 Failed: Built-in index dropped."
+    assert indexed.indexes['category'].buckets is indexed.products_by_category and indexed.products_by_category["Chairs"] >= {1201, 1203}, "Test Case 20 Failed: Category index not registered."
+    assert indexed.filter_product_ids(min_price=800, max_price=900) == [1201] and plans[-1] == 'price', "Test Case 20 Failed: Price index not used."
+    try:
+        indexed.filter_products(min_prce=100)
+        misspelled = False
+    except TypeError:
+        misspelled = True
+    assert misspelled, "Test Case 20 Failed: Misspelled criterion accepted."
+    print("Test Case 20 Passed.")
+
+    # Test Case 21: Top-k by price, stock value and quantity under filters
+    print("Test Case 21: Top-k ranked queries.")
+    ranked = Inventory()
+    ranked.bulk_load([(1301, "Lounge Chair", 1400.00, 4, "Chairs"), (1302, "Side Chair", 220.00, 0, "Chairs"),
+                      (1303, "Stool", 180.00, 12, "Chairs"), (1304, "Task Chair", 640.00, 30, "Chairs"),
+                      (1305, "Coffee Table", 700.00, 9, "Tables")])
+    cheapest = ranked.top_k('price', 2, category="Chairs", min_quantity=1)
+    assert [product.product_id for product in cheapest] == [1303, 1304], "Test Case 21 Failed: Cheapest in stock."
+    highest_value = ranked.top_k('stock_value', 2, descending=True)
+    assert [product.product_id for product in highest_value] == [1304, 1305], "Test Case 21 Failed: Stock value ranking."
+    assert [product.product_id for product in ranked.top_k('quantity', 1, descending=True, max_price=650)] == [1304], "Test Case 21 Failed: Most stocked."
+    assert ranked.top_k('price', 0) == [] and len(ranked.top_k('name', 10)) == 5, "Test Case 21 Failed: Bounds."
+    print("Test Case 21 Passed.")
+
+    # Test Case 22: Manual and automatic compaction keep query results
+    print("Test Case 22: Compaction after mass removals.")
+    delisted = Inventory(compact_threshold=0.25)
+    delisted.bulk_load([(i, f"Product : {i}", 10.0 + i % 90, i % 50, ["Lounge", "Chairs"][i % 2]) for i in range(1, 20001)])
+    for product_id in range(1, 14001):
+        delisted.remove_product(product_id)
+    expected = sorted(delisted.filter_product_ids(category="Chairs", min_price=50, name_keyword="99"))
+    report = delisted.compact()
+    assert report is not None and report['reclaimed_bytes'] > 0 and report['peak_products'] == 20000, "Test Case 22 Failed: Nothing reclaimed."
+    assert sorted(delisted.filter_product_ids(category="Chairs", min_price=50, name_keyword="99")) == expected, "Test Case 22 Failed: Results changed."
+    assert delisted.compact() is None and delisted.peak_products == 6000, "Test Case 22 Failed: Compacted twice."
+    for product_id in range(14001, 19000):
+        delisted.remove_product(product_id)
+    assert delisted.peak_products < 6000 and len(delisted.products) == 1001, "Test Case 22 Failed: Automatic compaction."
+    print("Test Case 22 Passed.")
+
 # Stress Testing
     print("--Stress Testing--")
     # Larger Size for stress testing.
@@ -271,6 +3037,7 @@ def run_advance_testing():
         quantity = random.randint(1, 100)
         category = random.choice(["Lounge", "Chairs", "Tables", "Case Goods"])
         stress_inventory.add_product(product_id, name, price, quantity, category)
+    stress_inventory.warm_up()
     
     # Perform random operations on the large dataset
     for _ in range(stress_size // 2):
@@ -293,6 +3060,8 @@ def run_advance_testing():
     # Basic check for consistency after stress test
     print(f"Final number of products after stress test: {len(stress_inventory.products)}")
     assert len(stress_inventory.products) <= stress_size, "Stress Test Failed: Product count inconsistency."
+    compaction = stress_inventory.compact(force=True)
+    print(f"Compaction reclaimed {compaction['reclaimed_bytes']} bytes in {compaction['seconds'] * 1000} milliseconds.")
 
     # Test with unexpected inputs
     print("\n--Unexpected Input--")
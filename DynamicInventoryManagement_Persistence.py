@@ -0,0 +1,614 @@
+"""
+Project 1: Data Structure Design and Implementation
+Dynamic Inventory Management System - Persistence.
+
+Durable inventory state for the optimized implementation. Every change is appended to a binary write-ahead log (WAL)
+and the whole catalog is periodically written to a compact snapshot, so a restart loads the snapshot in one bulk
+load and replays only the WAL records written after it. A fixed layout snapshot can also be memory-mapped and
+queried in place, without loading anything.
+"""
+import marshal
+import mmap
+import os
+import random
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+
+from DynamicInventoryManagement_Optimized import ColumnarProductStore, Inventory, Product, extra_attributes, np
+
+# Each WAL record is a header (payload length, crc32 of payload, log sequence number) followed by the payload,
+# a marshalled (op, product_id, fields) tuple.
+WAL_HEADER = struct.Struct('<IIQ')
+SNAPSHOT_MAGIC = b'INVSNAP1'
+# Rows per marshalled snapshot chunk, bounds memory while writing and loading.
+SNAPSHOT_CHUNK_ROWS = 65536
+
+# Append-only log of inventory changes with group commit. Records are buffered and written together once
+# group_size records are waiting or flush_interval seconds have passed, and fsync runs every fsync_every writes.
+# A timer flushes records still waiting after flush_interval, so quiet periods keep the same window.
+class WriteAheadLog:
+    def __init__(self, path, group_size=512, flush_interval=0.05, fsync_every=4, fsync=True):
+        self.path = path
+        self.group_size = group_size
+        self.flush_interval = flush_interval
+        self.fsync_every = fsync_every
+        self.fsync = fsync
+        # Continue numbering after the last complete record already in the file.
+        self.lsn = 0
+        valid_bytes = 0
+        for lsn, _, _, _, end in self._scan(path):
+            self.lsn = lsn
+            valid_bytes = end
+        self.file = open(path, 'ab')
+        # Drop a torn record left by a crash in the middle of a write.
+        if self.file.tell() > valid_bytes:
+            self.file.truncate(valid_bytes)
+        self.buffer = []
+        self.writes = 0
+        self.records_since_checkpoint = 0
+        self.last_flush = time.monotonic()
+        # The flush timer runs on its own thread, the lock keeps it and the writers off the buffer together.
+        self.lock = threading.RLock()
+        self.timer = None
+
+    # Log one change and return its sequence number. Matches the Inventory listener signature.
+    def append(self, op, product_id, fields):
+        payload = marshal.dumps((op, product_id, fields))
+        with self.lock:
+            self.lsn += 1
+            self.buffer.append(WAL_HEADER.pack(len(payload), zlib.crc32(payload), self.lsn) + payload)
+            self.records_since_checkpoint += 1
+            if len(self.buffer) >= self.group_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+            elif self.timer is None:
+                # No further append may come to flush this record.
+                self.timer = threading.Timer(self.flush_interval, self._timed_flush)
+                self.timer.daemon = True
+                self.timer.start()
+            return self.lsn
+
+    # Helper run by the flush timer.
+    def _timed_flush(self):
+        with self.lock:
+            self.timer = None
+            if not self.file.closed:
+                self.flush()
+
+    # Write buffered records in one call, fsync every fsync_every writes or when sync is True.
+    def flush(self, sync=False):
+        with self.lock:
+            if self.buffer:
+                self.file.write(b''.join(self.buffer))
+                self.buffer.clear()
+                self.file.flush()
+                self.writes += 1
+                if self.fsync and (sync or self.writes % self.fsync_every == 0):
+                    os.fsync(self.file.fileno())
+            elif sync and self.fsync:
+                os.fsync(self.file.fileno())
+            self.last_flush = time.monotonic()
+
+    # Flush and force every logged record to disk.
+    def sync(self):
+        self.flush(sync=True)
+
+    # Empty the log once a snapshot covers every record, sequence numbers keep counting up.
+    def truncate(self):
+        with self.lock:
+            self.flush()
+            self.file.truncate(0)
+            self.file.seek(0)
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self.records_since_checkpoint = 0
+
+    def close(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.sync()
+            self.file.close()
+
+    # Helper yielding (lsn, op, product_id, fields, end offset) for each complete record, stopping at a torn tail.
+    @staticmethod
+    def _scan(path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as log:
+            data = log.read()
+        offset = 0
+        while offset + WAL_HEADER.size <= len(data):
+            length, checksum, lsn = WAL_HEADER.unpack_from(data, offset)
+            start = offset + WAL_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+            op, product_id, fields = marshal.loads(payload)
+            offset = start + length
+            yield lsn, op, product_id, fields, offset
+
+    # Complete records of a log file as (lsn, op, product_id, fields).
+    @classmethod
+    def read_records(cls, path):
+        for lsn, op, product_id, fields, _ in cls._scan(path):
+            yield lsn, op, product_id, fields
+
+# Helper yielding (product_id, name, price, quantity, category) rows, straight from the columns for columnar storage.
+# Products with extra attributes get them as a sixth element.
+def product_rows(inventory):
+    products = inventory.products
+    if isinstance(products, ColumnarProductStore):
+        categories = products.categories
+        rows = zip(products.ids, products.names, products.price, products.quantity,
+                   (categories[code] for code in products.category_codes))
+        attributes = products.attributes
+        if not attributes:
+            return rows
+        return (row + (attributes[row[0]],) if row[0] in attributes else row for row in rows)
+    return (_product_row(product.product_id, product.data) for product in products.values())
+
+# Helper giving the snapshot row of one product.
+def _product_row(product_id, data):
+    row = (product_id, data['name'], data['price'], data['quantity'], data['category'])
+    attributes = extra_attributes(data)
+    return row + (attributes,) if attributes else row
+
+# Write every product to path as a snapshot covering the log up to lsn. Written to a temporary file and
+# renamed into place so a crash never leaves a half written snapshot.
+def write_snapshot(inventory, path, lsn=0):
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as snapshot:
+        snapshot.write(SNAPSHOT_MAGIC)
+        marshal.dump((lsn, len(inventory.products)), snapshot)
+        chunk = []
+        for row in product_rows(inventory):
+            chunk.append(row)
+            if len(chunk) == SNAPSHOT_CHUNK_ROWS:
+                marshal.dump(chunk, snapshot)
+                chunk = []
+        marshal.dump(chunk, snapshot)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temp_path, path)
+
+# Load a snapshot into inventory with one bulk load, returns the log sequence number it covers.
+def load_snapshot(inventory, path):
+    with open(path, 'rb') as snapshot:
+        if snapshot.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not an inventory snapshot.")
+        lsn, row_count = marshal.load(snapshot)
+
+        def rows():
+            remaining = row_count
+            while True:
+                chunk = marshal.load(snapshot)
+                yield from chunk
+                remaining -= len(chunk)
+                if remaining <= 0 or not chunk:
+                    return
+
+        inventory.bulk_load(rows())
+    return lsn
+
+# Apply logged records to inventory. Runs of 'add' records are loaded together through bulk_upsert.
+def replay_records(inventory, records):
+    pending = []
+    replayed = 0
+    for op, product_id, fields in records:
+        replayed += 1
+        if op == 'add':
+            pending.append(_product_row(product_id, fields))
+            continue
+        if pending:
+            inventory.bulk_upsert(pending)
+            pending = []
+        if op == 'update':
+            product = inventory.get_product(product_id)
+            if product is not None:
+                data = dict(product.data)
+                data.update(fields)
+                inventory.add_product(product_id, data['name'], data['price'], data['quantity'], data['category'],
+                                      **extra_attributes(data))
+        elif op == 'remove':
+            inventory.remove_product(product_id)
+        elif op == 'clear':
+            inventory.bulk_load([])
+    if pending:
+        inventory.bulk_upsert(pending)
+    return replayed
+
+# Inventory kept durable in a directory holding one snapshot and one WAL. Opening recovers the inventory from
+# the snapshot plus the WAL tail, after which every change is logged. checkpoint() writes a new snapshot and
+# empties the log; maybe_checkpoint() does so once checkpoint_every records have been logged.
+class DurableInventory:
+    def __init__(self, directory, inventory=None, group_size=512, flush_interval=0.05, fsync_every=4,
+                 fsync=True, checkpoint_every=100000):
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, 'inventory.snapshot')
+        self.wal_path = os.path.join(directory, 'inventory.wal')
+        self.checkpoint_every = checkpoint_every
+        self.inventory = inventory if inventory is not None else Inventory()
+
+        # Recovery: snapshot first, then only the records written after it.
+        snapshot_lsn = 0
+        if os.path.exists(self.snapshot_path):
+            snapshot_lsn = load_snapshot(self.inventory, self.snapshot_path)
+        tail = (record[1:] for record in WriteAheadLog.read_records(self.wal_path) if record[0] > snapshot_lsn)
+        self.replayed = replay_records(self.inventory, tail)
+
+        self.wal = WriteAheadLog(self.wal_path, group_size, flush_interval, fsync_every, fsync)
+        self.wal.lsn = max(self.wal.lsn, snapshot_lsn)
+        self.inventory.add_listener(self.wal.append)
+
+    # Snapshot the current state and empty the log.
+    def checkpoint(self):
+        self.wal.flush()
+        write_snapshot(self.inventory, self.snapshot_path, self.wal.lsn)
+        self.wal.truncate()
+
+    def maybe_checkpoint(self):
+        if self.wal.records_since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+            return True
+        return False
+
+    # Force every logged change to disk.
+    def sync(self):
+        self.wal.sync()
+
+    def close(self):
+        self.inventory.remove_listener(self.wal.append)
+        self.wal.close()
+
+# Fixed layout snapshot: magic, a header of counts and section offsets, then 8 byte aligned sections.
+# Rows are sorted by product id, the posting lists hold the row numbers of each category.
+MAPPED_MAGIC = b'INVMMAP1'
+MAPPED_HEADER = struct.Struct('<12Q')
+MAPPED_SECTIONS = ('ids', 'price', 'quantity', 'category_codes', 'name_offsets', 'names',
+                   'category_offsets', 'category_names', 'posting_offsets', 'postings')
+
+# Helper padding a byte string to a multiple of 8 so every section starts aligned.
+def _aligned(data):
+    return data + b'\0' * (-len(data) % 8)
+
+# Write inventory as a fixed layout snapshot for MappedInventory. Product ids must be integers and categories
+# strings, since categories are stored as their UTF-8 text.
+def write_mapped_snapshot(inventory, path):
+    rows = sorted(product_rows(inventory), key=lambda row: row[0])
+    if any(not isinstance(row[0], int) for row in rows):
+        raise ValueError("Mapped snapshots need integer product ids.")
+    if any(not isinstance(row[4], str) for row in rows):
+        raise ValueError("Mapped snapshots need string categories.")
+    category_lookup = {}
+    postings = []
+    codes = array('I')
+    for row_number, row in enumerate(rows):
+        code = category_lookup.setdefault(row[4], len(category_lookup))
+        if code == len(postings):
+            postings.append(array('I'))
+        postings[code].append(row_number)
+        codes.append(code)
+
+    name_offsets = array('Q', [0])
+    encoded_names = []
+    for row in rows:
+        encoded = row[1].encode('utf-8')
+        encoded_names.append(encoded)
+        name_offsets.append(name_offsets[-1] + len(encoded))
+    category_offsets = array('Q', [0])
+    encoded_categories = []
+    for category in category_lookup:
+        encoded = category.encode('utf-8')
+        encoded_categories.append(encoded)
+        category_offsets.append(category_offsets[-1] + len(encoded))
+    posting_offsets = array('Q', [0])
+    for posting in postings:
+        posting_offsets.append(posting_offsets[-1] + len(posting))
+
+    sections = [
+        array('q', (row[0] for row in rows)).tobytes(),
+        array('d', (row[2] for row in rows)).tobytes(),
+        array('q', (row[3] for row in rows)).tobytes(),
+        codes.tobytes(),
+        name_offsets.tobytes(),
+        b''.join(encoded_names),
+        category_offsets.tobytes(),
+        b''.join(encoded_categories),
+        posting_offsets.tobytes(),
+        b''.join(posting.tobytes() for posting in postings),
+    ]
+    offsets = []
+    position = len(MAPPED_MAGIC) + MAPPED_HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(_aligned(section))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as snapshot:
+        snapshot.write(MAPPED_MAGIC)
+        snapshot.write(MAPPED_HEADER.pack(len(rows), len(category_lookup), *offsets))
+        for section in sections:
+            snapshot.write(_aligned(section))
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temp_path, path)
+
+# Read-only inventory served straight from a memory-mapped snapshot. Opening only reads the header and the
+# category names, columns are read in place by the queries, and Product objects are only built for results.
+# Only point lookups, filters and id ordered listings are served in place, use to_inventory for the rest of the
+# Inventory API (writes, listeners, reservations, extra attributes, iter_sorted, top_k, ...).
+class MappedInventory:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAPPED_MAGIC)] != MAPPED_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a mapped inventory snapshot.")
+        header = MAPPED_HEADER.unpack_from(self.map, len(MAPPED_MAGIC))
+        self.size, category_count = header[0], header[1]
+        self.offsets = dict(zip(MAPPED_SECTIONS, header[2:]))
+        view = memoryview(self.map)
+        self.view = view
+
+        # Zero-copy typed views over the column sections.
+        def column(section, typecode, count):
+            start = self.offsets[section]
+            return view[start:start + count * 8 if typecode in 'qdQ' else start + count * 4].cast(typecode)
+
+        self.ids = column('ids', 'q', self.size)
+        self.price = column('price', 'd', self.size)
+        self.quantity = column('quantity', 'q', self.size)
+        self.category_codes = column('category_codes', 'I', self.size)
+        self.name_offsets = column('name_offsets', 'Q', self.size + 1)
+        self.posting_offsets = column('posting_offsets', 'Q', category_count + 1)
+        self.postings = column('postings', 'I', self.posting_offsets[category_count])
+        category_offsets = column('category_offsets', 'Q', category_count + 1)
+        category_start = self.offsets['category_names']
+        # Category names are few, decode them once.
+        self.categories = [bytes(view[category_start + category_offsets[i]:category_start + category_offsets[i + 1]]).decode('utf-8')
+                           for i in range(category_count)]
+        category_offsets.release()
+        self.category_lookup = {category: code for code, category in enumerate(self.categories)}
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Release the views before unmapping, an exported buffer cannot be closed.
+    def close(self):
+        for name in ('ids', 'price', 'quantity', 'category_codes', 'name_offsets', 'posting_offsets', 'postings', 'view'):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self.map.close()
+        self.file.close()
+
+    # Helper decoding the name of a row.
+    def _name(self, row):
+        start = self.offsets['names']
+        return bytes(self.view[start + self.name_offsets[row]:start + self.name_offsets[row + 1]]).decode('utf-8')
+
+    # Helper building a Product for a row.
+    def _product(self, row):
+        return Product(self.ids[row], self._name(row), self.price[row], self.quantity[row],
+                       self.categories[self.category_codes[row]])
+
+    # Helper returning the row of a product id, or None. Rows are sorted by id so this is a binary search.
+    def _row(self, product_id):
+        row = bisect_left(self.ids, product_id)
+        if row < self.size and self.ids[row] == product_id:
+            return row
+        return None
+
+    def get_product(self, product_id):
+        row = self._row(product_id)
+        return None if row is None else self._product(row)
+
+    # Row numbers of a category, read from its posting list.
+    def category_rows(self, category):
+        code = self.category_lookup.get(category)
+        if code is None:
+            return self.postings[0:0]
+        return self.postings[self.posting_offsets[code]:self.posting_offsets[code + 1]]
+
+    # Rows matching the criteria. With NumPy the column criteria are masks over the mapped columns.
+    def _filter_rows(self, category, min_price, max_price, min_quantity, max_quantity, name_keyword, name_prefix):
+        if category and category not in self.category_lookup:
+            return []
+        if np is not None and self.size:
+            mask = np.ones(self.size, dtype=bool)
+            if category:
+                mask &= np.frombuffer(self.category_codes, dtype=np.uint32) == self.category_lookup[category]
+            prices = np.frombuffer(self.price, dtype=np.float64)
+            quantities = np.frombuffer(self.quantity, dtype=np.int64)
+            if min_price is not None:
+                mask &= prices >= min_price
+            if max_price is not None:
+                mask &= prices <= max_price
+            if min_quantity is not None:
+                mask &= quantities >= min_quantity
+            if max_quantity is not None:
+                mask &= quantities <= max_quantity
+            rows = np.flatnonzero(mask).tolist()
+            del prices, quantities
+        else:
+            rows = []
+            candidates = self.category_rows(category) if category else range(self.size)
+            price, quantity = self.price, self.quantity
+            for row in candidates:
+                if min_price is not None and price[row] < min_price:
+                    continue
+                if max_price is not None and price[row] > max_price:
+                    continue
+                if min_quantity is not None and quantity[row] < min_quantity:
+                    continue
+                if max_quantity is not None and quantity[row] > max_quantity:
+                    continue
+                rows.append(row)
+        # Names are only decoded for rows that passed the column criteria.
+        if name_keyword is not None:
+            keyword = name_keyword.lower()
+            rows = [row for row in rows if keyword in self._name(row).lower()]
+        if name_prefix is not None:
+            prefix = name_prefix.lower()
+            rows = [row for row in rows if self._name(row).lower().startswith(prefix)]
+        return rows
+
+    def filter_products(self, category=None, min_price=None, max_price=None,
+                        min_quantity=None, max_quantity=None, name_keyword=None, name_prefix=None):
+        rows = self._filter_rows(category, min_price, max_price, min_quantity, max_quantity, name_keyword, name_prefix)
+        return [self._product(row) for row in rows]
+
+    def filter_product_ids(self, category=None, min_price=None, max_price=None,
+                           min_quantity=None, max_quantity=None, name_keyword=None, name_prefix=None):
+        rows = self._filter_rows(category, min_price, max_price, min_quantity, max_quantity, name_keyword, name_prefix)
+        return [self.ids[row] for row in rows]
+
+    # Products in product id order, only the requested page is built.
+    def list_products(self, limit=None, offset=0):
+        Inventory._check_page(limit, offset)
+        end = self.size if limit is None else min(self.size, offset + limit)
+        return [self._product(row) for row in range(offset, end)]
+
+    # Copy the snapshot into a regular mutable Inventory with one bulk load.
+    def to_inventory(self, storage='dict'):
+        inventory = Inventory(storage)
+        inventory.bulk_load({'product_id': self.ids.tolist(), 'name': [self._name(row) for row in range(self.size)],
+                             'price': self.price.tolist(), 'quantity': self.quantity.tolist(),
+                             'category': [self.categories[code] for code in self.category_codes]})
+        return inventory
+
+# Testing recovery and timing logging, snapshotting and restart.
+def run_persistence_testing():
+    print("---Persistence Testing---")
+    directory = tempfile.mkdtemp(prefix='inventory_')
+    categories = ["Lounge", "Chairs", "Tables", "Case Goods"]
+    try:
+        # Test Case 1: Recovery from the WAL alone.
+        print("Test Case 1: Replaying the write-ahead log.")
+        durable = DurableInventory(directory)
+        durable.inventory.add_product(1, "Three-seater Sofa", 1899.99, 10, "Lounge")
+        durable.inventory.add_product(2, "Desk Chair", 389.99, 25, "Chairs")
+        durable.inventory.update_price(1, 1799.99)
+        durable.inventory.update_quantity(2, -5)
+        durable.inventory.remove_product(2)
+        durable.close()
+        recovered = DurableInventory(directory)
+        product = recovered.inventory.get_product(1)
+        assert product.data['price'] == 1799.99 and recovered.inventory.get_product(2) is None, "Test Case 1 Failed: WAL replay."
+        print("Test Case 1 Passed.")
+
+        # Test Case 2: Snapshot plus WAL tail.
+        print("Test Case 2: Checkpoint and tail replay.")
+        recovered.inventory.bulk_upsert([(i, f"Product : {i}", 10.0 + i, i % 100, random.choice(categories))
+                                         for i in range(3, 1003)])
+        recovered.checkpoint()
+        recovered.inventory.update_quantity(3, 7)
+        recovered.close()
+        restarted = DurableInventory(directory)
+        assert restarted.replayed == 1, "Test Case 2 Failed: Only the tail should be replayed."
+        assert len(restarted.inventory.products) == 1001 and restarted.inventory.get_product(3).data['quantity'] == 10, "Test Case 2 Failed: Snapshot state."
+        restarted.close()
+        print("Test Case 2 Passed.")
+
+        # Test Case 3: Torn record at the end of the WAL is ignored.
+        print("Test Case 3: Torn WAL tail.")
+        with open(restarted.wal_path, 'ab') as log:
+            log.write(WAL_HEADER.pack(100, 0, 99) + b'partial')
+        torn = DurableInventory(directory)
+        assert torn.replayed == 1, "Test Case 3 Failed: Torn record replayed."
+        torn.close()
+        print("Test Case 3 Passed.")
+
+        # Test Case 4: Memory-mapped snapshot answers queries in place.
+        print("Test Case 4: Memory-mapped snapshot.")
+        mapped_path = os.path.join(directory, 'inventory.mapped')
+        source = torn.inventory
+        write_mapped_snapshot(source, mapped_path)
+        with MappedInventory(mapped_path) as mapped:
+            assert len(mapped) == len(source.products), "Test Case 4 Failed: Row count."
+            assert repr(mapped.get_product(3)) == repr(source.get_product(3)) and mapped.get_product(5000) is None, "Test Case 4 Failed: Point lookup."
+            criteria = dict(category="Chairs", min_price=200, max_quantity=50, name_keyword="1")
+            assert sorted(mapped.filter_product_ids(**criteria)) == sorted(source.filter_product_ids(**criteria)), "Test Case 4 Failed: Filter."
+            assert [p.product_id for p in mapped.list_products(limit=3, offset=1)] == [3, 4, 5], "Test Case 4 Failed: Listing."
+        # A category that is not a string would come back as its text, so the snapshot is refused.
+        uncategorized = Inventory()
+        uncategorized.add_product(1, "Loose Part", 9.99, 3, None)
+        try:
+            write_mapped_snapshot(uncategorized, mapped_path)
+            rejected = False
+        except ValueError:
+            rejected = True
+        with MappedInventory(mapped_path) as mapped:
+            assert rejected and len(mapped) == len(source.products), "Test Case 4 Failed: Category None written."
+        print("Test Case 4 Passed.")
+
+        # Test Case 5: A lone write is flushed by the timer within the flush interval.
+        print("Test Case 5: Flush during a quiet period.")
+        quiet = DurableInventory(os.path.join(directory, 'quiet'), flush_interval=0.05, fsync=False)
+        quiet.inventory.add_product(1, "Ottoman", 249.99, 4, "Lounge")
+        time.sleep(0.5)
+        logged = [record[2] for record in WriteAheadLog.read_records(quiet.wal_path)]
+        assert logged == [1] and not quiet.wal.buffer and quiet.wal.timer is None, "Test Case 5 Failed: Record left in the buffer."
+        quiet.close()
+        print("Test Case 5 Passed.")
+
+        # Timing: logged writes and restart at larger sizes.
+        for size in [10000, 100000, 200000]:
+            print(f"\nTesting durability for {size} products.")
+            shutil.rmtree(directory)
+            durable = DurableInventory(directory, Inventory())
+            start_time = time.perf_counter()
+            for i in range(size):
+                durable.inventory.add_product(i + 1, f"Product : {i + 1}", round(random.uniform(10, 1000), 2),
+                                              random.randint(0, 100), random.choice(categories))
+            durable.sync()
+            elapsed_time = ((time.perf_counter() - start_time) * 1000)
+            print(f"Logged Adds Running Time: {elapsed_time} ms.")
+
+            start_time = time.perf_counter()
+            durable.checkpoint()
+            elapsed_time = ((time.perf_counter() - start_time) * 1000)
+            print(f"Checkpoint Running Time: {elapsed_time} ms.")
+            for i in range(size // 10):
+                durable.inventory.update_quantity(random.randint(1, size), -1)
+            durable.close()
+
+            start_time = time.perf_counter()
+            restarted = DurableInventory(directory)
+            elapsed_time = ((time.perf_counter() - start_time) * 1000)
+            print(f"Recovery (snapshot + {restarted.replayed} WAL records) Running Time: {elapsed_time} ms.")
+
+            mapped_path = os.path.join(directory, 'inventory.mapped')
+            write_mapped_snapshot(restarted.inventory, mapped_path)
+            restarted.close()
+            start_time = time.perf_counter()
+            mapped = MappedInventory(mapped_path)
+            elapsed_time = ((time.perf_counter() - start_time) * 1000)
+            print(f"Open Mapped Snapshot Running Time: {elapsed_time} ms.")
+            start_time = time.perf_counter()
+            mapped.filter_products(category="Chairs", min_price=300, max_quantity=15)
+            elapsed_time = ((time.perf_counter() - start_time) * 1000)
+            print(f"Filter Mapped Snapshot Running Time: {elapsed_time} ms.")
+            mapped.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+# Main function to demonstrate durable inventory state.
+
+if __name__ == "__main__":
+    run_persistence_testing()
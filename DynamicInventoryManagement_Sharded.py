@@ -0,0 +1,297 @@
+"""
+Project 1: Data Structure Design and Implementation
+Dynamic Inventory Management System - Sharded.
+
+Inventory partitioned across worker processes so the work is not capped by a single interpreter lock.
+Product ids are hash-partitioned across the shards, point operations go to the owning shard, and filters and
+listings are sent to every shard and merged. Operations can be sent in batches, one message per shard.
+"""
+import heapq
+import multiprocessing
+import os
+import random
+import time
+from itertools import chain, islice
+
+from DynamicInventoryManagement_Optimized import Inventory, Product, extra_attributes
+
+# Methods sent to every shard, their per-shard results are merged.
+SCATTER_METHODS = ('filter_products', 'filter_product_ids', 'list_products', 'size')
+
+# Helper turning shard results into plain objects that pickle cheaply, columnar products would drag their store along.
+def _portable(result):
+    if isinstance(result, Product):
+        data = result.data
+        return Product(result.product_id, data['name'], data['price'], data['quantity'], data['category'],
+                       **extra_attributes(data))
+    if isinstance(result, list) and result and isinstance(result[0], Product):
+        return [_portable(product) for product in result]
+    return result
+
+# Worker loop owning one shard. Each message is a list of (method, args, kwargs) calls, answered with
+# (True, results) or (False, exception) for the first failing call.
+def _shard_worker(connection, storage):
+    inventory = Inventory(storage)
+    while True:
+        calls = connection.recv()
+        if calls is None:
+            break
+        results = []
+        try:
+            for method, args, kwargs in calls:
+                if method == 'size':
+                    results.append(len(inventory.products))
+                else:
+                    results.append(_portable(getattr(inventory, method)(*args, **kwargs)))
+        except Exception as error:
+            connection.send((False, error))
+            continue
+        connection.send((True, results))
+    connection.close()
+
+# Helper giving the key shard results are merged on, matching Inventory.sort_key.
+def _merge_key(order_by):
+    if order_by is None or order_by == 'product_id':
+        return lambda product: product.product_id
+    if order_by == 'name':
+        return lambda product: (product.data['name'].lower(), product.product_id)
+    return lambda product: (product.data[order_by], product.product_id)
+
+# Inventory spread across worker processes, one Inventory per shard.
+class ShardedInventory:
+    def __init__(self, shards=None, storage='dict'):
+        self.shard_count = shards or os.cpu_count() or 1
+        self.connections = []
+        self.workers = []
+        for _ in range(self.shard_count):
+            parent_end, child_end = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_shard_worker, args=(child_end, storage), daemon=True)
+            worker.start()
+            child_end.close()
+            self.connections.append(parent_end)
+            self.workers.append(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for worker in self.workers:
+            worker.join()
+        self.connections = []
+
+    # Shard owning a product id.
+    def shard_of(self, product_id):
+        return hash(product_id) % self.shard_count
+
+    # Helper sending each shard its list of calls at once, then collecting the replies. Shards work in parallel.
+    def _dispatch(self, calls_by_shard):
+        for shard, calls in calls_by_shard.items():
+            self.connections[shard].send(calls)
+        replies = {}
+        error = None
+        for shard in calls_by_shard:
+            ok, payload = self.connections[shard].recv()
+            if ok:
+                replies[shard] = payload
+            elif error is None:
+                error = payload
+        if error is not None:
+            raise error
+        return replies
+
+    # Helper calling one method on one shard.
+    def _call(self, shard, method, *args, **kwargs):
+        return self._dispatch({shard: [(method, args, kwargs)]})[shard][0]
+
+    # Helper merging scattered results of one call.
+    @staticmethod
+    def _merge(method, kwargs, parts):
+        if method in ('size', 'warm_up'):
+            return sum(parts)
+        limit = kwargs.get('limit')
+        offset = kwargs.get('offset', 0)
+        end = None if limit is None else offset + limit
+        if method == 'filter_product_ids':
+            return list(chain.from_iterable(parts))
+        order_by = kwargs.get('order_by')
+        if method == 'list_products' or order_by is not None or kwargs.get('after') is not None or kwargs.get('descending'):
+            merged = heapq.merge(*parts, key=_merge_key(order_by), reverse=kwargs.get('descending', False))
+        else:
+            merged = chain.from_iterable(parts)
+        return list(islice(merged, offset, end))
+
+    # Helper adjusting paging arguments so every shard returns enough rows for the merged page.
+    @staticmethod
+    def _scatter_kwargs(kwargs):
+        Inventory._check_page(kwargs.get('limit'), kwargs.get('offset', 0))
+        if kwargs.get('limit') is None and not kwargs.get('offset'):
+            return kwargs
+        shard_kwargs = dict(kwargs)
+        if kwargs.get('limit') is not None:
+            shard_kwargs['limit'] = kwargs.get('offset', 0) + kwargs['limit']
+        shard_kwargs['offset'] = 0
+        return shard_kwargs
+
+    # Run many operations with one message per shard. ops is a list of (method, args) or (method, args, kwargs);
+    # point operations take the product id as first argument. Results come back in op order and match running
+    # the ops one by one, since each shard runs its part in order.
+    def execute_batch(self, ops):
+        calls_by_shard = {}
+        plan = []
+        for op in ops:
+            method, args = op[0], tuple(op[1])
+            kwargs = op[2] if len(op) > 2 else {}
+            if method in SCATTER_METHODS:
+                positions = []
+                shard_kwargs = self._scatter_kwargs(kwargs)
+                for shard in range(self.shard_count):
+                    calls = calls_by_shard.setdefault(shard, [])
+                    positions.append((shard, len(calls)))
+                    calls.append((method, args, shard_kwargs))
+                plan.append((method, kwargs, positions))
+            else:
+                shard = self.shard_of(args[0])
+                calls = calls_by_shard.setdefault(shard, [])
+                plan.append((method, kwargs, [(shard, len(calls))]))
+                calls.append((method, args, kwargs))
+        replies = self._dispatch(calls_by_shard)
+        results = []
+        for method, kwargs, positions in plan:
+            if method in SCATTER_METHODS:
+                parts = [replies[shard][index] for shard, index in positions]
+                results.append(self._merge(method, kwargs, parts))
+            else:
+                shard, index = positions[0]
+                results.append(replies[shard][index])
+        return results
+
+    # Helper sending one scatter call to every shard and merging the parts.
+    def _scatter(self, method, *args, **kwargs):
+        shard_kwargs = self._scatter_kwargs(kwargs)
+        replies = self._dispatch({shard: [(method, args, shard_kwargs)] for shard in range(self.shard_count)})
+        return self._merge(method, kwargs, [replies[shard][0] for shard in range(self.shard_count)])
+
+    def add_product(self, product_id, name, price, quantity, category, **attributes):
+        return self._call(self.shard_of(product_id), 'add_product', product_id, name, price, quantity, category,
+                          **attributes)
+
+    def get_product(self, product_id):
+        return self._call(self.shard_of(product_id), 'get_product', product_id)
+
+    def remove_product(self, product_id):
+        return self._call(self.shard_of(product_id), 'remove_product', product_id)
+
+    def update_price(self, product_id, price):
+        return self._call(self.shard_of(product_id), 'update_price', product_id, price)
+
+    def update_quantity(self, product_id, quantity):
+        return self._call(self.shard_of(product_id), 'update_quantity', product_id, quantity)
+
+    # Products for many ids in one round trip per shard, as a product_id -> Product (or None) dictionary.
+    def get_products(self, product_ids):
+        product_ids = list(product_ids)
+        results = self.execute_batch([('get_product', (product_id,)) for product_id in product_ids])
+        return dict(zip(product_ids, results))
+
+    # Split rows by shard and bulk upsert every part in parallel. Returns the combined row counts.
+    def bulk_upsert(self, data):
+        parts = {}
+        for row in Inventory._bulk_rows(data):
+            parts.setdefault(self.shard_of(row[0]), []).append(row)
+        start_time = time.perf_counter()
+        replies = self._dispatch({shard: [('bulk_upsert', (rows,), {})] for shard, rows in parts.items()})
+        elapsed = time.perf_counter() - start_time
+        stats = [reply[0] for reply in replies.values()]
+        row_count = sum(part['rows'] for part in stats)
+        return {'rows': row_count, 'inserted': sum(part['inserted'] for part in stats),
+                'updated': sum(part['updated'] for part in stats), 'seconds': elapsed,
+                'rows_per_sec': row_count / elapsed if elapsed > 0 else float('inf')}
+
+    # Post the deferred name n-grams on every shard in parallel. Returns the number of names posted.
+    def warm_up(self):
+        return self._scatter('warm_up')
+
+    def filter_products(self, **criteria):
+        return self._scatter('filter_products', **criteria)
+
+    def filter_product_ids(self, **criteria):
+        return self._scatter('filter_product_ids', **criteria)
+
+    # All products in product id order (or order_by), merged from the sorted shard listings.
+    def list_products(self, **paging):
+        return self._scatter('list_products', **paging)
+
+    def __len__(self):
+        return self._scatter('size')
+
+# Random mixed operations in the style of the optimized stress test.
+def _stress_ops(count, size, categories):
+    ops = []
+    for _ in range(count):
+        oper_type = random.choice(["add", "get", "remove", "filter"])
+        product_id = random.randint(1, size)
+        if oper_type == "add":
+            ops.append(("add_product", (product_id, f"UpdatedStressProduct_{product_id}", random.uniform(1, 1000),
+                                        random.randint(1, 100), random.choice(categories))))
+        elif oper_type == "get":
+            ops.append(("get_product", (product_id,)))
+        elif oper_type == "remove":
+            ops.append(("remove_product", (product_id,)))
+        else:
+            ops.append(("filter_product_ids", (), {'category': random.choice(categories),
+                                                   'min_price': random.uniform(1, 500)}))
+    return ops
+
+# Stress test comparing one inventory with the sharded one on the same mixed workload.
+def run_sharded_stress_testing(stress_size=200000, operations=2000, batch_size=200, shards=None):
+    print("---Sharded Stress Testing---")
+    categories = ["Lounge", "Chairs", "Tables", "Case Goods"]
+    rows = [(i + 1, f"StressProduct: {i + 1}", random.uniform(1, 1000), random.randint(1, 100),
+             random.choice(categories)) for i in range(stress_size)]
+    ops = _stress_ops(operations, stress_size, categories)
+
+    single = Inventory()
+    single.bulk_load(rows)
+    single.warm_up()
+    start_time = time.perf_counter()
+    expected = []
+    for op in ops:
+        kwargs = op[2] if len(op) > 2 else {}
+        expected.append(getattr(single, op[0])(*op[1], **kwargs))
+    elapsed_single = time.perf_counter() - start_time
+    print(f"Single process: {operations} operations in {elapsed_single * 1000} ms "
+          f"({operations / elapsed_single:.0f} ops/sec).")
+
+    with ShardedInventory(shards) as sharded:
+        sharded.bulk_upsert(rows)
+        assert sharded.warm_up() == stress_size, "Sharded Stress Test Failed: Warm-up."
+        start_time = time.perf_counter()
+        results = []
+        for start in range(0, len(ops), batch_size):
+            results.extend(sharded.execute_batch(ops[start:start + batch_size]))
+        elapsed_sharded = time.perf_counter() - start_time
+        print(f"{sharded.shard_count} shards: {operations} operations in {elapsed_sharded * 1000} ms "
+              f"({operations / elapsed_sharded:.0f} ops/sec).")
+
+        # Same answers as the single inventory, filters compared as id sets since shard order differs.
+        for op, want, got in zip(ops, expected, results):
+            if op[0] == "filter_product_ids":
+                assert sorted(want) == sorted(got), "Sharded Stress Test Failed: Filter results differ."
+            elif op[0] == "get_product":
+                assert (want is None) == (got is None), "Sharded Stress Test Failed: Lookup results differ."
+            else:
+                assert want == got, "Sharded Stress Test Failed: Write results differ."
+        assert len(sharded) == len(single.products), "Sharded Stress Test Failed: Product count inconsistency."
+        assert sharded.list_products(limit=5) == single.list_products(limit=5), "Sharded Stress Test Failed: Listing."
+        print("Sharded results match the single inventory.")
+
+# Main function to demonstrate the sharded inventory.
+
+if __name__ == "__main__":
+    run_sharded_stress_testing()